@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from dinero import CERO, a_dinero
+
+class LineaCarrito:
+    """Una línea del carrito. Usa `__slots__` para que cada línea ocupe poca memoria."""
+    __slots__ = ('iid', 'id', 'codigo', 'nombre', 'precio', 'cantidad', 'subtotal', 'tipo', 'sku')
+
+    def __init__(self, iid, id, codigo, nombre, precio, cantidad=1, tipo='Unidad', sku=None):
+        self.iid = iid # Identificador de la línea (también es el id de la fila en el Treeview)
+        self.id = id # Id del producto
+        self.codigo = codigo
+        self.nombre = nombre
+        self.precio = precio
+        self.cantidad = cantidad
+        self.subtotal = precio * cantidad
+        self.tipo = tipo or 'Unidad'
+        self.sku = sku
+
+    def es_unidad(self):
+        """Indica si el producto se vende por unidad (y por lo tanto descuenta stock)."""
+        return self.tipo.lower().startswith('unidad')
+
+    def copia(self):
+        return LineaCarrito(self.iid, self.id, self.codigo, self.nombre, self.precio, self.cantidad, self.tipo, self.sku)
+
+class Carrito:
+    """
+    Carrito de la venta en curso. Mantiene las líneas en orden de inserción junto con un índice
+    id de producto → línea, así agregar, incrementar, quitar y consultar el total no recorren la lista.
+    Además registra qué líneas cambiaron para que la interfaz redibuje solo esas filas.
+    """
+    def __init__(self):
+        self._lineas = {} # iid -> LineaCarrito, en orden de inserción
+        self._por_producto = {} # id de producto -> línea por unidad
+        self._siguiente_iid = 0
+        self._modificadas = {}
+        self._eliminadas = []
+        self.total = CERO # Decimal exacto, se ajusta con cada cambio
+
+    def __iter__(self):
+        return iter(self._lineas.values())
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def _nueva_linea(self, producto, precio, tipo):
+        linea = LineaCarrito(f"L{self._siguiente_iid}", producto['id'], producto['codigo_barras'], producto['nombre'],
+                             precio, 1, tipo, producto.get('sku'))
+        self._siguiente_iid += 1
+        self._lineas[linea.iid] = linea
+        self._modificadas[linea.iid] = linea
+        self.total += linea.subtotal
+        return linea
+
+    def agregar_unidad(self, producto):
+        """Suma una unidad del producto: incrementa su línea si ya está en el carrito o crea una nueva."""
+        linea = self._por_producto.get(producto['id'])
+        if linea is None:
+            linea = self._nueva_linea(producto, a_dinero(producto['precio_venta']), producto.get('tipo'))
+            self._por_producto[producto['id']] = linea
+        else:
+            subtotal_anterior = linea.subtotal
+            linea.cantidad += 1
+            linea.subtotal = linea.precio * linea.cantidad
+            self.total += linea.subtotal - subtotal_anterior
+            self._modificadas[linea.iid] = linea
+        return linea
+
+    def agregar_granel(self, producto, precio):
+        """Agrega una línea por precio (venta a granel). Cada pesada es una línea distinta."""
+        return self._nueva_linea(producto, a_dinero(precio), producto.get('tipo'))
+
+    def quitar(self, iid):
+        """Quita la línea indicada y devuelve la línea eliminada, o None si no existe."""
+        linea = self._lineas.pop(iid, None)
+        if linea is None:
+            return None
+        if self._por_producto.get(linea.id) is linea:
+            del self._por_producto[linea.id]
+        self._modificadas.pop(iid, None)
+        self._eliminadas.append(iid)
+        self.total -= linea.subtotal
+        return linea
+
+    def actualizar_precio(self, id_producto, precio):
+        """Cambia el precio de la línea por unidad del producto (si está en el carrito) y ajusta el total."""
+        linea = self._por_producto.get(id_producto)
+        if linea is None:
+            return None
+        subtotal_anterior = linea.subtotal
+        linea.precio = a_dinero(precio)
+        linea.subtotal = linea.precio * linea.cantidad
+        self.total += linea.subtotal - subtotal_anterior
+        self._modificadas[linea.iid] = linea
+        return linea
+
+    def cantidades_por_producto(self):
+        """Devuelve {id de producto: cantidad} de las líneas que descuentan stock."""
+        cantidades = {}
+        for linea in self._lineas.values():
+            if linea.es_unidad():
+                cantidades[linea.id] = cantidades.get(linea.id, 0) + linea.cantidad
+        return cantidades
+
+    def tomar_cambios(self):
+        """Devuelve `(modificadas, eliminadas)` desde la última llamada y reinicia el registro."""
+        modificadas, eliminadas = list(self._modificadas.values()), self._eliminadas
+        self._modificadas, self._eliminadas = {}, []
+        return modificadas, eliminadas
+
+    def copia(self):
+        """Copia independiente del carrito, para entregarla a un hilo de trabajo o a la impresión."""
+        otro = Carrito()
+        for linea in self._lineas.values():
+            nueva = linea.copia()
+            otro._lineas[nueva.iid] = nueva
+            if self._por_producto.get(nueva.id) is linea:
+                otro._por_producto[nueva.id] = nueva
+        otro._siguiente_iid = self._siguiente_iid
+        otro.total = self.total
+        return otro
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from database import Database
+
+class CatalogoProductos:
+    """
+    Caché en memoria de la tabla `productos`, indexada por código de barras y por SKU.
+    Se carga completa al iniciar y permite resolver cada escaneo sin ir a la base de datos.
+    Cada producto vale `vigencia` segundos: pasado ese tiempo el siguiente escaneo lo vuelve a leer,
+    así los cambios de precio hechos desde otra terminal llegan sin reiniciar.
+    El stock y el precio guardados aquí son orientativos: la venta los vuelve a verificar en la BD al confirmarse.
+    """
+    VIGENCIA_SEGUNDOS = 300
+
+    def __init__(self, db_config, vigencia=VIGENCIA_SEGUNDOS):
+        self.db_config = db_config
+        self.vigencia = vigencia
+        self._por_codigo = {}
+        self._por_sku = {}
+        self._por_id = {}
+        self._leido_en = {} # id -> momento (time.monotonic) en que se leyó de la BD
+        self._lock = threading.RLock()
+        self.cargado = False
+
+        # Contadores para diagnóstico
+        self.aciertos = 0
+        self.fallos = 0
+        self.vencidos = 0
+
+    def _indexar(self, producto):
+        """Agrega (o reemplaza) un producto en los tres índices."""
+        anterior = self._por_id.get(producto['id'])
+        if anterior:
+            self._desindexar(anterior)
+        self._por_id[producto['id']] = producto
+        self._leido_en[producto['id']] = time.monotonic()
+        self._por_codigo[producto['codigo_barras']] = producto
+        if producto.get('sku'):
+            self._por_sku[producto['sku']] = producto
+
+    def _desindexar(self, producto):
+        """Quita un producto de los tres índices."""
+        self._por_id.pop(producto['id'], None)
+        self._leido_en.pop(producto['id'], None)
+        if self._por_codigo.get(producto['codigo_barras']) is producto:
+            del self._por_codigo[producto['codigo_barras']]
+        if producto.get('sku') and self._por_sku.get(producto['sku']) is producto:
+            del self._por_sku[producto['sku']]
+
+    def cargar(self):
+        """Lee todos los productos de la base de datos y reconstruye los índices."""
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            productos = db.fetchall("SELECT * FROM productos")
+        finally:
+            db.disconnect()
+
+        with self._lock:
+            self._por_codigo, self._por_sku, self._por_id, self._leido_en = {}, {}, {}, {}
+            for producto in productos:
+                self._indexar(producto)
+            self.cargado = True
+
+    def _consultar_bd(self, codigo):
+        """Busca un código en la BD, primero como código de barras y luego como SKU."""
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            producto = db.fetchone("SELECT * FROM productos WHERE codigo_barras = %s", (codigo,))
+            if not producto:
+                producto = db.fetchone("SELECT * FROM productos WHERE sku = %s", (codigo,))
+            return producto
+        finally:
+            db.disconnect()
+
+    def buscar(self, codigo):
+        """
+        Devuelve una copia del producto cuyo código de barras o SKU coincide con `codigo`, o None.
+        Si el código no está en memoria, o su lectura es más vieja que `vigencia`, se consulta la BD
+        para cubrir productos dados de alta o modificados desde otra terminal; lo encontrado queda en
+        caché para los siguientes escaneos.
+        """
+        with self._lock:
+            producto = self._por_codigo.get(codigo) or self._por_sku.get(codigo)
+            if producto and time.monotonic() - self._leido_en.get(producto['id'], 0) < self.vigencia:
+                self.aciertos += 1
+                return dict(producto)
+            if producto:
+                self.vencidos += 1
+            else:
+                self.fallos += 1
+            vencido = producto
+
+        producto = self._consultar_bd(codigo)
+        with self._lock:
+            if vencido and self._por_id.get(vencido['id']) is vencido:
+                self._desindexar(vencido) # Pudo cambiar de código o haberse borrado
+            if producto:
+                self._indexar(producto)
+        return dict(producto) if producto else None
+
+    def invalidar(self, ids=(), codigos=()):
+        """
+        Descarta los productos indicados (por id o por código de barras).
+        El próximo escaneo los volverá a leer de la BD con sus valores actuales.
+        """
+        with self._lock:
+            for id_producto in ids:
+                producto = self._por_id.get(id_producto)
+                if producto:
+                    self._desindexar(producto)
+            for codigo in codigos:
+                producto = self._por_codigo.get(codigo)
+                if producto:
+                    self._desindexar(producto)
+
+    def estadisticas(self):
+        """Devuelve un diccionario con el tamaño de la caché y sus contadores."""
+        with self._lock:
+            return {
+                'productos': len(self._por_id),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'vencidos': self.vencidos,
+            }
+
+_catalogos = {}
+_catalogos_lock = threading.Lock()
+
+def obtener_catalogo(db_config):
+    """Devuelve el catálogo del proceso para esta configuración, creándolo la primera vez."""
+    clave = tuple(sorted(db_config.items()))
+    with _catalogos_lock:
+        catalogo = _catalogos.get(clave)
+        if catalogo is None:
+            catalogo = CatalogoProductos(dict(db_config))
+            _catalogos[clave] = catalogo
+        return catalogo
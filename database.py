@@ -1,26 +1,184 @@
 # -*- coding: utf-8 -*-
 
+import threading
+import time
+import unicodedata
 import mysql.connector
 
+def _clave_intercalacion(valor):
+    """Aproxima la comparación de utf8mb4_unicode_ci (sin mayúsculas ni acentos) para emparejar valores en Python."""
+    valor = unicodedata.normalize("NFKD", valor)
+    return "".join(c for c in valor if not unicodedata.combining(c)).casefold().rstrip()
+
+class PoolConexiones:
+    """
+    Pool de conexiones MySQL compartido por todo el proceso.
+    Las ventanas piden prestada una conexión con `obtener()` y la devuelven con `devolver()`,
+    evitando el costo del handshake TCP + autenticación en cada acción.
+    """
+    def __init__(self, config_db, tamano_maximo=5, tiempo_espera=10):
+        self.config = config_db
+        self.tamano_maximo = tamano_maximo
+        self.tiempo_espera = tiempo_espera
+        self._libres = []
+        self._creadas = 0
+        self._condicion = threading.Condition()
+
+        # Contadores para diagnóstico
+        self.aciertos = 0          # Préstamos servidos con una conexión ya abierta
+        self.conexiones_nuevas = 0 # Conexiones abiertas (incluye reconexiones)
+        self.reconexiones = 0      # Conexiones descartadas por no responder
+        self.esperas = 0           # Veces que se tuvo que esperar por el límite de tamaño
+        self.tiempo_espera_total = 0.0
+
+    def _conexion_sana(self, conexion):
+        """Verifica que la conexión siga viva antes de prestarla."""
+        try:
+            conexion.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _abrir(self):
+        conexion = mysql.connector.connect(**self.config)
+        self.conexiones_nuevas += 1
+        return conexion
+
+    def obtener(self):
+        """
+        Presta una conexión del pool. Si no hay libres y se alcanzó el tamaño máximo,
+        espera hasta `tiempo_espera` segundos a que otra ventana devuelva una.
+        """
+        inicio = time.perf_counter()
+        with self._condicion:
+            esperando = False
+            while not self._libres and self._creadas >= self.tamano_maximo:
+                if not esperando:
+                    esperando = True
+                    self.esperas += 1
+                restante = self.tiempo_espera - (time.perf_counter() - inicio)
+                if restante <= 0 or not self._condicion.wait(restante):
+                    if not self._libres and self._creadas >= self.tamano_maximo:
+                        self.tiempo_espera_total += time.perf_counter() - inicio
+                        raise mysql.connector.errors.PoolError("No hay conexiones disponibles en el pool.")
+            self.tiempo_espera_total += time.perf_counter() - inicio
+
+            conexion = self._libres.pop() if self._libres else None
+            if conexion is None:
+                self._creadas += 1
+
+        if conexion is not None:
+            if self._conexion_sana(conexion):
+                self.aciertos += 1
+                return conexion
+            self.reconexiones += 1
+            try:
+                conexion.close()
+            except mysql.connector.Error:
+                pass
+
+        try:
+            return self._abrir()
+        except mysql.connector.Error:
+            with self._condicion:
+                self._creadas -= 1
+                self._condicion.notify()
+            raise
+
+    def devolver(self, conexion):
+        """Devuelve una conexión al pool, descartando cualquier transacción no confirmada."""
+        sana = False
+        try:
+            if conexion.is_connected():
+                if conexion.in_transaction:
+                    conexion.rollback()
+                sana = True
+        except mysql.connector.Error:
+            sana = False
+
+        with self._condicion:
+            if sana:
+                self._libres.append(conexion)
+            else:
+                self._creadas -= 1
+            self._condicion.notify()
+
+        if not sana:
+            try:
+                conexion.close()
+            except mysql.connector.Error:
+                pass
+
+    def estadisticas(self):
+        """Devuelve un diccionario con los contadores del pool."""
+        with self._condicion:
+            return {
+                'tamano_maximo': self.tamano_maximo,
+                'abiertas': self._creadas,
+                'libres': len(self._libres),
+                'aciertos': self.aciertos,
+                'conexiones_nuevas': self.conexiones_nuevas,
+                'reconexiones': self.reconexiones,
+                'esperas': self.esperas,
+                'tiempo_espera_total': self.tiempo_espera_total,
+            }
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres del pool."""
+        with self._condicion:
+            libres, self._libres = self._libres, []
+            self._creadas -= len(libres)
+        for conexion in libres:
+            try:
+                conexion.close()
+            except mysql.connector.Error:
+                pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obtener_pool(config_db):
+    """Devuelve el pool del proceso para esta configuración, creándolo la primera vez."""
+    clave = tuple(sorted(config_db.items()))
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = PoolConexiones(dict(config_db))
+            _pools[clave] = pool
+        return pool
+
 class Database:
     def __init__(self, config_db):
         self.config = config_db
         self.connection = None
         self.cursor = None
+        self.pool = obtener_pool(config_db)
 
     def connect(self):
         try:
-            self.connection = mysql.connector.connect(**self.config)
+            self.connection = self.pool.obtener()
             self.cursor = self.connection.cursor(dictionary=True)
-            # print("Conexión a la base de datos exitosa.")
         except mysql.connector.Error as err:
             raise Exception(f"Error de conexión a la base de datos: {err}")
 
     def disconnect(self):
-        if self.connection and self.connection.is_connected():
-            self.cursor.close()
-            self.connection.close()
-            # print("Desconexión de la base de datos.")
+        if self.connection:
+            try:
+                if self.cursor:
+                    self.cursor.close()
+            except mysql.connector.Error:
+                pass
+            self.pool.devolver(self.connection)
+            self.connection = None
+            self.cursor = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.disconnect()
+        return False
 
     def execute(self, query, params=None):
         self.cursor.execute(query, params or ())
@@ -34,10 +192,11 @@ class Database:
         self.cursor.execute(query, params or ())
         return self.cursor.fetchall()
 
-    def get_or_create(self, table_name, data):
+    def get_or_create(self, table_name, data, confirmar=True):
         """
         Obtiene el ID de una fila si existe, de lo contrario la crea.
         Asume que la tabla tiene una columna 'nombre' o 'valor' que es UNIQUE.
+        Con `confirmar=False` no hace commit ni rollback: la fila queda en la transacción del llamador.
         """
         key_col = 'valor' if table_name == 'valores_atributos' else 'nombre'
         value = data.get(key_col)
@@ -46,22 +205,78 @@ class Database:
             raise ValueError(f"El diccionario de datos debe contener la clave '{key_col}'")
 
         try:
-            # Primero, intentar obtener el ID con una búsqueda insensible a mayúsculas/minúsculas
-            select_query = f"SELECT id FROM {table_name} WHERE LOWER({key_col}) = LOWER(%s)"
+            # La columna tiene una intercalación que no distingue mayúsculas (ver `migraciones.py`),
+            # así que la comparación directa usa el índice UNIQUE en vez de recorrer la tabla.
+            select_query = f"SELECT id FROM {table_name} WHERE {key_col} = %s"
             result = self.fetchone(select_query, (value,))
             
             if result:
                 return result['id']
             else:
-                # Si no existe, crearlo
-                insert_query = f"INSERT INTO {table_name} ({key_col}) VALUES (%s)"
+                # Si no existe, crearlo. Si otra terminal la creó recién, ON DUPLICATE KEY devuelve su id
+                # en lugar de fallar. (No se usa de entrada porque consumiría un AUTO_INCREMENT en cada
+                # llamada, y los ids forman parte del SKU.)
+                insert_query = f"INSERT INTO {table_name} ({key_col}) VALUES (%s) ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)"
                 self.execute(insert_query, (value,))
-                self.connection.commit()
+                if confirmar:
+                    self.connection.commit()
                 return self.cursor.lastrowid
         except mysql.connector.Error as err:
-            self.connection.rollback()
+            if confirmar:
+                self.connection.rollback()
             raise Exception(f"Error en get_or_create para la tabla {table_name}: {err}")
 
+    TAM_LOTE = 1000 # Valores por consulta IN (...) o INSERT de varias filas
+
+    def get_or_create_many(self, table_name, values, confirmar=True):
+        """
+        Versión en lote de `get_or_create`: devuelve un diccionario {valor: id} para todos los `values`.
+        Busca los existentes con una consulta IN (...), inserta los que faltan con un INSERT de varias
+        filas, vuelve a leer sus ids y confirma una sola vez. Con `confirmar=False` no hace commit.
+        """
+        key_col = 'valor' if table_name == 'valores_atributos' else 'nombre'
+        pendientes = {}
+        for value in values:
+            if not value:
+                raise ValueError(f"Los valores para '{key_col}' no pueden estar vacíos")
+            pendientes.setdefault(_clave_intercalacion(value), []).append(value)
+
+        resultado = {}
+        def resolver(claves):
+            for inicio in range(0, len(claves), self.TAM_LOTE):
+                lote = [pendientes[c][0] for c in claves[inicio:inicio + self.TAM_LOTE] if c in pendientes]
+                if not lote:
+                    continue
+                marcadores = ", ".join(["%s"] * len(lote))
+                filas = self.fetchall(f"SELECT id, {key_col} FROM {table_name} WHERE {key_col} IN ({marcadores})", tuple(lote))
+                for fila in filas:
+                    for value in pendientes.pop(_clave_intercalacion(fila[key_col]), []):
+                        resultado[value] = fila['id']
+
+        try:
+            resolver(list(pendientes))
+            if pendientes:
+                # Si otra terminal creó alguno mientras tanto, el ON DUPLICATE KEY no cambia nada; a diferencia
+                # de INSERT IGNORE, cualquier otro error (datos demasiado largos, etc.) sí se informa.
+                # mysql.connector convierte executemany en un solo INSERT de varias filas.
+                faltantes = [(valores[0],) for valores in pendientes.values()]
+                sql_insertar = f"INSERT INTO {table_name} ({key_col}) VALUES (%s) ON DUPLICATE KEY UPDATE {key_col} = {key_col}"
+                for inicio in range(0, len(faltantes), self.TAM_LOTE):
+                    self.cursor.executemany(sql_insertar, faltantes[inicio:inicio + self.TAM_LOTE])
+                resolver(list(pendientes))
+            for valores in list(pendientes.values()):
+                # Lo que no se pudo emparejar (diferencias de intercalación que la clave no reproduce)
+                id_fila = self.get_or_create(table_name, {key_col: valores[0]}, confirmar=False)
+                for value in valores:
+                    resultado[value] = id_fila
+            if confirmar:
+                self.connection.commit()
+            return resultado
+        except mysql.connector.Error as err:
+            if confirmar:
+                self.connection.rollback()
+            raise Exception(f"Error en get_or_create_many para la tabla {table_name}: {err}")
+
     def obtener_rubro_id_por_familia(self, familia_id):
         try:
             self.connect()
@@ -77,146 +292,83 @@ class Database:
         finally:
             self.disconnect()
 
-def inicializar_base_datos(config_ini):
+def refrescar_productos_busqueda(cursor, condicion="1 = 1", params=()):
     """
-    Se conecta al servidor MySQL, crea la base de datos y las tablas necesarias si no existen.
-    También actualiza la estructura de las tablas si se detectan versiones antiguas.
+    Recalcula las filas de `productos_busqueda` (proyección desnormalizada para la búsqueda avanzada)
+    de los productos que cumplen `condicion`. La condición puede usar los alias p, ps, f, r, m, va1 y va2.
+    No confirma la transacción: se llama dentro de la misma transacción que hizo el cambio.
     """
-    conexion = None
-    cursor = None
-    try:
-        conexion = mysql.connector.connect(
-            host=config_ini['host'],
-            user=config_ini['user'],
-            password=config_ini['password'],
-            port=config_ini['port']
-        )
-        cursor = conexion.cursor()
-        
-        db_name = config_ini['database']
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
-        conexion.database = db_name
-        
-        tablas = {}
-        tablas['rubro'] = """
-            CREATE TABLE IF NOT EXISTS rubro (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(50) UNIQUE NOT NULL
-            ) ENGINE=InnoDB;
-        """
-        tablas['familia'] = """
-            CREATE TABLE IF NOT EXISTS familia (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                rubro_id INT,
-                nombre VARCHAR(50) UNIQUE NOT NULL,
-                FOREIGN KEY (rubro_id) REFERENCES rubro(id) ON DELETE SET NULL
-            ) ENGINE=InnoDB;
-        """
-        tablas['marca'] = """
-            CREATE TABLE IF NOT EXISTS marca (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(50) UNIQUE NOT NULL
-            ) ENGINE=InnoDB;
-        """
-        tablas['valores_atributos'] = """
-            CREATE TABLE IF NOT EXISTS valores_atributos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                valor VARCHAR(50) UNIQUE NOT NULL
-            ) ENGINE=InnoDB;
-        """
-        tablas['definicion_atributos'] = """
-            CREATE TABLE IF NOT EXISTS definicion_atributos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                familia_id INT UNIQUE,
-                label_atributo_1 VARCHAR(50),
-                label_atributo_2 VARCHAR(50),
-                FOREIGN KEY (familia_id) REFERENCES familia(id) ON DELETE CASCADE
-            ) ENGINE=InnoDB;
-        """
-        tablas['producto_sku'] = """
-            CREATE TABLE IF NOT EXISTS producto_sku (
-                sku VARCHAR(12) PRIMARY KEY,
-                familia_id INT,
-                marca_id INT,
-                atributo_1_id INT,
-                atributo_2_id INT,
-                FOREIGN KEY (familia_id) REFERENCES familia(id),
-                FOREIGN KEY (marca_id) REFERENCES marca(id),
-                FOREIGN KEY (atributo_1_id) REFERENCES valores_atributos(id),
-                FOREIGN KEY (atributo_2_id) REFERENCES valores_atributos(id)
-            ) ENGINE=InnoDB;
-        """
-        tablas['productos'] = """
-            CREATE TABLE IF NOT EXISTS productos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                codigo_barras VARCHAR(50) UNIQUE NOT NULL,
-                nombre VARCHAR(100) NOT NULL,
-                precio_venta DECIMAL(10,2) DEFAULT 0.00,
-                stock_actual INT DEFAULT 0,
-                tipo VARCHAR(10) DEFAULT 'Unidad',
-                sku VARCHAR(12) UNIQUE NULL,
-                FOREIGN KEY (sku) REFERENCES producto_sku(sku) ON DELETE SET NULL
-            ) ENGINE=InnoDB;
-        """
-        tablas['ventas'] = """
-            CREATE TABLE IF NOT EXISTS ventas (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
-                total DECIMAL(10,2),
-                metodo_pago VARCHAR(50) DEFAULT 'Efectivo'
-            ) ENGINE=InnoDB;
-        """
-        tablas['detalle_ventas'] = """
-            CREATE TABLE IF NOT EXISTS detalle_ventas (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                id_venta INT,
-                id_producto INT,
-                cantidad INT,
-                precio_unitario DECIMAL(10,2),
-                subtotal DECIMAL(10,2),
-                FOREIGN KEY (id_venta) REFERENCES ventas(id),
-                FOREIGN KEY (id_producto) REFERENCES productos(id)
-            ) ENGINE=InnoDB;
-        """
+    cursor.execute(f"""
+        REPLACE INTO productos_busqueda (producto_id, rubro_id, rubro_nombre, familia_id, familia_nombre,
+            marca_id, marca_nombre, atributo_1_id, atributo_1_valor, atributo_2_id, atributo_2_valor)
+        SELECT p.id, r.id, r.nombre, f.id, f.nombre, m.id, m.nombre, va1.id, va1.valor, va2.id, va2.valor
+        FROM productos p
+        LEFT JOIN producto_sku ps ON p.sku = ps.sku
+        LEFT JOIN familia f ON ps.familia_id = f.id
+        LEFT JOIN rubro r ON f.rubro_id = r.id
+        LEFT JOIN marca m ON ps.marca_id = m.id
+        LEFT JOIN valores_atributos va1 ON ps.atributo_1_id = va1.id
+        LEFT JOIN valores_atributos va2 ON ps.atributo_2_id = va2.id
+        WHERE {condicion}
+    """, params)
 
-        for nombre_tabla, query in sorted(tablas.items()):
-            cursor.execute(query)
+# Hora en que empieza el día comercial: una venta a las 02:00 cuenta para el día anterior.
+HORA_CORTE = 6
 
-        # Actualizaciones de estructura de tablas para versiones antiguas
-        try:
-            cursor.execute("ALTER TABLE ventas MODIFY COLUMN metodo_pago VARCHAR(50) DEFAULT 'Efectivo'")
-        except mysql.connector.Error:
-            pass
-
-        try:
-            cursor.execute("SHOW COLUMNS FROM ventas LIKE 'pago_con'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE ventas ADD COLUMN pago_con DECIMAL(10,2) DEFAULT 0.00")
-        except mysql.connector.Error:
-            pass
+def sumar_venta_al_resumen(cursor, id_venta):
+    """
+    Suma la venta `id_venta` a su fila de `resumen_diario` (día comercial y método de pago).
+    Se llama dentro de la transacción que guarda la venta, después de insertar su detalle, así el
+    resumen nunca queda desfasado. El bruto es la suma de `detalle_ventas.subtotal` (lo que muestra
+    el ticket, sin el recargo de la tarjeta), igual que los totales de la exportación.
+    """
+    cursor.execute(f"""
+        INSERT INTO resumen_diario (fecha_comercial, metodo_pago, tickets, unidades, bruto)
+        SELECT DATE(v.fecha_venta - INTERVAL {HORA_CORTE} HOUR), COALESCE(v.metodo_pago, ''), 1,
+               COALESCE(SUM(dv.cantidad), 0), COALESCE(SUM(dv.subtotal), 0)
+        FROM ventas v LEFT JOIN detalle_ventas dv ON dv.id_venta = v.id
+        WHERE v.id = %s
+        GROUP BY v.id
+        ON DUPLICATE KEY UPDATE tickets = tickets + VALUES(tickets), unidades = unidades + VALUES(unidades), bruto = bruto + VALUES(bruto)
+    """, (id_venta,))
 
-        try:
-            cursor.execute("SHOW COLUMNS FROM ventas LIKE 'vuelto'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE ventas ADD COLUMN vuelto DECIMAL(10,2) DEFAULT 0.00")
-        except mysql.connector.Error:
-            pass
+def reconstruir_resumen_diario(cursor, desde=None, hasta=None):
+    """
+    Recalcula `resumen_diario` desde `ventas` y `detalle_ventas` para los días comerciales entre
+    `desde` y `hasta` (fechas, inclusive), o para todo el historial si no se indican.
+    El bruto se calcula como en `sumar_venta_al_resumen`: suma de `detalle_ventas.subtotal`.
+    No confirma la transacción. Lanza `ValueError` si se indica solo uno de los dos extremos.
+    """
+    if (desde is None) != (hasta is None):
+        raise ValueError("Para reconstruir un rango se deben indicar 'desde' y 'hasta'")
+    filtro_resumen, filtro_ventas, params = "", "", ()
+    if desde is not None:
+        filtro_resumen = "WHERE fecha_comercial BETWEEN %s AND %s"
+        filtro_ventas = f"WHERE v.fecha_venta >= %s + INTERVAL {HORA_CORTE} HOUR AND v.fecha_venta < %s + INTERVAL {24 + HORA_CORTE} HOUR"
+        params = (desde, hasta)
 
-        try:
-            cursor.execute("SHOW COLUMNS FROM ventas LIKE 'fecha_venta'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE ventas ADD COLUMN fecha_venta DATETIME DEFAULT CURRENT_TIMESTAMP")
-        except mysql.connector.Error:
-            pass
-        
-        print("🚀 Inicialización de base de datos completa.")
-        return True
+    cursor.execute(f"DELETE FROM resumen_diario {filtro_resumen}", params)
+    cursor.execute(f"""
+        INSERT INTO resumen_diario (fecha_comercial, metodo_pago, tickets, unidades, bruto)
+        SELECT DATE(t.fecha_venta - INTERVAL {HORA_CORTE} HOUR), COALESCE(t.metodo_pago, ''), COUNT(*), COALESCE(SUM(t.unidades), 0), COALESCE(SUM(t.bruto), 0)
+        FROM (
+            SELECT v.id, v.fecha_venta, v.metodo_pago, SUM(dv.cantidad) AS unidades, SUM(dv.subtotal) AS bruto
+            FROM ventas v LEFT JOIN detalle_ventas dv ON dv.id_venta = v.id
+            {filtro_ventas}
+            GROUP BY v.id
+        ) t
+        GROUP BY DATE(t.fecha_venta - INTERVAL {HORA_CORTE} HOUR), COALESCE(t.metodo_pago, '')
+    """, params)
 
-    except mysql.connector.Error as err:
-        print(f"❌ Error de conexión crítico: {err}")
-        return False
-    finally:
-        if cursor:
-            cursor.close()
-        if conexion and conexion.is_connected():
-            conexion.close()
+def asegurar_indice(cursor, tabla, nombre, columnas, tipo="INDEX"):
+    """
+    Crea el índice `nombre` sobre `columnas` si no existe, o lo recrea si existe con otras columnas.
+    `cursor` debe ser un cursor de tuplas (el de las migraciones).
+    """
+    cursor.execute(f"SHOW INDEX FROM {tabla} WHERE Key_name = %s", (nombre,))
+    actuales = [fila[4] for fila in sorted(cursor.fetchall(), key=lambda fila: fila[3])] # Column_name por Seq_in_index
+    if actuales == list(columnas):
+        return
+    if actuales:
+        cursor.execute(f"DROP INDEX {nombre} ON {tabla}")
+    cursor.execute(f"CREATE {tipo} {nombre} ON {tabla} ({', '.join(columnas)})")
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Todos los importes se manejan como Decimal con dos decimales, igual que las columnas DECIMAL(10,2)
+# de la base de datos. Así los totales, recargos y vueltos son exactos y no hace falta tolerancia.
+CENTAVO = Decimal("0.01")
+CERO = Decimal("0.00")
+
+def a_dinero(valor):
+    """Convierte `valor` (Decimal, int, str o float) a Decimal redondeado al centavo."""
+    if isinstance(valor, float):
+        valor = repr(valor) # Evita arrastrar el error binario del float (p. ej. 0.1 → 0.1000000000000000055...)
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+def leer_decimal(texto):
+    """Interpreta un número escrito por el usuario. Acepta coma o punto decimal. Lanza ValueError si no es válido."""
+    texto = str(texto).strip().replace(",", ".")
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"Número inválido: {texto!r}")
+    if not numero.is_finite():
+        raise ValueError(f"Número inválido: {texto!r}")
+    return numero
+
+def leer_dinero(texto):
+    """Como `leer_decimal`, pero redondeado al centavo."""
+    return leer_decimal(texto).quantize(CENTAVO, rounding=ROUND_HALF_UP)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import queue
+import socket
+import threading
+import time
+import uuid
+
+class ImpresoraWindows:
+    """Envía los bytes en crudo (RAW) a una impresora instalada en Windows mediante win32print."""
+    def __init__(self, nombre_impresora):
+        self.nombre_impresora = nombre_impresora
+
+    def enviar(self, datos, nombre_trabajo="Ticket"):
+        import win32print # Solo existe en Windows; se importa al imprimir.
+        hPrinter = win32print.OpenPrinter(self.nombre_impresora)
+        try:
+            win32print.StartDocPrinter(hPrinter, 1, (nombre_trabajo, None, "RAW"))
+            try:
+                win32print.WritePrinter(hPrinter, datos)
+            finally:
+                win32print.EndDocPrinter(hPrinter)
+        finally:
+            win32print.ClosePrinter(hPrinter)
+
+class ImpresoraSocket:
+    """Envía los bytes a una impresora de red que acepta ESC/POS en crudo (normalmente el puerto 9100)."""
+    def __init__(self, host, puerto=9100, tiempo_espera=5):
+        self.host = host
+        self.puerto = puerto
+        self.tiempo_espera = tiempo_espera
+
+    def enviar(self, datos, nombre_trabajo="Ticket"):
+        with socket.create_connection((self.host, self.puerto), timeout=self.tiempo_espera) as conexion:
+            conexion.sendall(datos)
+
+class ImpresoraArchivo:
+    """
+    Reemplazo de la impresora que guarda cada trabajo como un archivo .bin en un directorio.
+    Sirve para probar el flujo de impresión en equipos sin impresora o sin Windows.
+    """
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def enviar(self, datos, nombre_trabajo="Ticket"):
+        nombre = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{nombre_trabajo}.bin"
+        with open(os.path.join(self.directorio, nombre), "wb") as f:
+            f.write(datos)
+
+def crear_impresora(config_impresion):
+    """
+    Crea el backend de impresión según la sección [impresion] de config.ini:
+    - `backend = windows` (por defecto): usa `nombre_impresora`.
+    - `backend = socket`: usa `host` y `puerto`.
+    - `backend = archivo`: usa `directorio`.
+    """
+    backend = config_impresion.get('backend', 'windows').strip().lower()
+    if backend == 'socket':
+        return ImpresoraSocket(config_impresion['host'], int(config_impresion.get('puerto', 9100)))
+    if backend == 'archivo':
+        return ImpresoraArchivo(config_impresion.get('directorio', 'tickets_impresos'))
+    return ImpresoraWindows(config_impresion['nombre_impresora'])
+
+class ColaImpresion:
+    """
+    Cola de impresión con un hilo propio, para que una impresora lenta o trabada no detenga la venta.
+    Cada trabajo se guarda primero en el directorio de spool y se borra recién cuando se imprimió,
+    así los tickets pendientes sobreviven a un cierre del programa y se reenvían al volver a abrirlo.
+    Si un trabajo falla en todos sus intentos, se renombra a `.err` y se avisa mediante `al_fallar`.
+    """
+    EXTENSION = ".prn"
+    EXTENSION_FALLIDO = ".err"
+
+    def __init__(self, impresora, directorio_spool="spool", reintentos=3, espera_reintento=2.0, al_fallar=None):
+        self.impresora = impresora
+        self.directorio_spool = directorio_spool
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self.al_fallar = al_fallar
+        self._cola = queue.Queue()
+
+        os.makedirs(self.directorio_spool, exist_ok=True)
+        for ruta in sorted(glob.glob(os.path.join(self.directorio_spool, "*" + self.EXTENSION))):
+            self._cola.put(ruta) # Trabajos que quedaron pendientes de una ejecución anterior
+
+        self._hilo = threading.Thread(target=self._procesar, name="cola-impresion", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, datos, nombre_trabajo="Ticket"):
+        """Guarda el trabajo en el spool y lo deja en cola. Vuelve de inmediato."""
+        nombre = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{nombre_trabajo}{self.EXTENSION}"
+        ruta = os.path.join(self.directorio_spool, nombre)
+        temporal = ruta + ".tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        os.replace(temporal, ruta) # El archivo aparece completo o no aparece
+        self._cola.put(ruta)
+        return ruta
+
+    def pendientes(self):
+        """Cantidad de trabajos que todavía no se imprimieron."""
+        return self._cola.qsize()
+
+    def fallidos(self):
+        """Cantidad de trabajos que agotaron sus intentos y esperan `reintentar_fallidos`."""
+        return len(glob.glob(os.path.join(self.directorio_spool, "*" + self.EXTENSION_FALLIDO)))
+
+    def reintentar_fallidos(self):
+        """Vuelve a encolar los trabajos que agotaron sus intentos. Devuelve cuántos se encolaron."""
+        rutas = sorted(glob.glob(os.path.join(self.directorio_spool, "*" + self.EXTENSION_FALLIDO)))
+        for ruta in rutas:
+            nueva_ruta = ruta[:-len(self.EXTENSION_FALLIDO)] + self.EXTENSION
+            os.replace(ruta, nueva_ruta)
+            self._cola.put(nueva_ruta)
+        return len(rutas)
+
+    def _procesar(self):
+        while True:
+            ruta = self._cola.get()
+            try:
+                self._imprimir(ruta)
+            except Exception as e:
+                print(f"Error inesperado en la cola de impresión: {e}")
+
+    def _imprimir(self, ruta):
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        nombre_trabajo = os.path.basename(ruta)[:-len(self.EXTENSION)].split("_", 3)[-1]
+
+        ultimo_error = None
+        for intento in range(1, self.reintentos + 1):
+            try:
+                self.impresora.enviar(datos, nombre_trabajo)
+                os.remove(ruta)
+                return
+            except Exception as e:
+                ultimo_error = e
+                print(f"Fallo al imprimir {os.path.basename(ruta)} (intento {intento}/{self.reintentos}): {e}")
+                if intento < self.reintentos:
+                    time.sleep(self.espera_reintento * intento)
+
+        os.replace(ruta, ruta[:-len(self.EXTENSION)] + self.EXTENSION_FALLIDO)
+        if self.al_fallar:
+            self.al_fallar(ultimo_error)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import unicodedata
+from collections import Counter
+from database import Database
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados. Se usa igual para indexar y para buscar."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+def _trigramas_subcadena(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _trigramas_palabras(texto):
+    """Trigramas con relleno al comienzo de cada palabra ("  c", " co"), para consultas de 1 o 2 letras."""
+    resultado = set()
+    for palabra in texto.replace("\x00", " ").split():
+        resultado.add("  " + palabra[0])
+        if len(palabra) > 1:
+            resultado.add(" " + palabra[:2])
+    return resultado
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre el nombre, el código de barras y el SKU de los productos.
+    Se comparte entre todas las ventanas de búsqueda (ver `obtener_indice`) y vive en memoria.
+
+    - `subcadena(consulta)`: ids cuyo texto contiene la consulta, intersectando las listas de los
+      trigramas de la consulta en lugar de recorrer todo el catálogo.
+    - `buscar(consulta)`: búsqueda tolerante a errores de tipeo, ordenada por relevancia.
+    """
+    SIMILITUD_MINIMA = 0.5 # Fracción de trigramas de la consulta que debe tener un producto
+    VIGENCIA_SEGUNDOS = 60 # Antigüedad máxima de la última lectura antes de ponerse al día en `actualizar`
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self._textos = {} # id -> texto normalizado ("nombre\x00codigo\x00sku")
+        self._trigramas = {} # id -> set de trigramas del producto
+        self._nombres = {} # id -> nombre original, para desempatar
+        self._listas = {} # trigrama -> set de ids
+        self._lock = threading.RLock()
+        self._lock_lectura = threading.Lock() # Una sola lectura del catálogo a la vez
+        self._leido_en = 0.0 # time.monotonic() de la última lectura completa
+        self.cargado = False
+
+    def _texto_de(self, producto):
+        return "\x00".join(normalizar(producto.get(campo)) for campo in ('nombre', 'codigo_barras', 'sku'))
+
+    def _indexar(self, producto):
+        self._quitar(producto['id'])
+        texto = self._texto_de(producto)
+        trigramas = _trigramas_subcadena(texto) | _trigramas_palabras(texto)
+        self._textos[producto['id']] = texto
+        self._trigramas[producto['id']] = trigramas
+        self._nombres[producto['id']] = producto.get('nombre') or ""
+        for trigrama in trigramas:
+            self._listas.setdefault(trigrama, set()).add(producto['id'])
+
+    def _quitar(self, id_producto):
+        trigramas = self._trigramas.pop(id_producto, None)
+        if trigramas is None:
+            return
+        del self._textos[id_producto]
+        del self._nombres[id_producto]
+        for trigrama in trigramas:
+            ids = self._listas.get(trigrama)
+            if ids is not None:
+                ids.discard(id_producto)
+                if not ids:
+                    del self._listas[trigrama]
+
+    def _leer_productos(self, where="", params=()):
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            return db.fetchall(f"SELECT id, codigo_barras, nombre, sku FROM productos {where}", params)
+        finally:
+            db.disconnect()
+
+    def cargar(self):
+        """Reconstruye el índice completo desde la base de datos."""
+        productos = self._leer_productos()
+        with self._lock:
+            self._textos, self._trigramas, self._nombres, self._listas = {}, {}, {}, {}
+            for producto in productos:
+                self._indexar(producto)
+            self.cargado = True
+            self._leido_en = time.monotonic()
+
+    def sincronizar(self, productos):
+        """
+        Ajusta el índice a `productos` (todas las filas de la tabla, ya leídas por quien llama):
+        vuelve a indexar los nuevos o modificados, por ejemplo desde otra terminal, y quita los borrados.
+        """
+        with self._lock:
+            presentes = set()
+            for producto in productos:
+                presentes.add(producto['id'])
+                if self._textos.get(producto['id']) != self._texto_de(producto):
+                    self._indexar(producto)
+            for id_producto in [i for i in self._textos if i not in presentes]:
+                self._quitar(id_producto)
+            self.cargado = True
+            self._leido_en = time.monotonic()
+
+    def actualizar(self, vigencia=VIGENCIA_SEGUNDOS):
+        """
+        Carga el índice si hace falta o, si la última lectura tiene más de `vigencia` segundos, lo pone
+        al día con `sincronizar` (solo reindexa lo que cambió). Como el índice es compartido, el catálogo
+        se lee a lo sumo una vez por período aunque haya varias ventanas buscando.
+        Conviene llamarlo fuera del hilo de la interfaz y sin tener otra conexión del pool tomada.
+        """
+        with self._lock_lectura:
+            if self.cargado and time.monotonic() - self._leido_en < vigencia:
+                return
+            self.sincronizar(self._leer_productos())
+
+    def asegurar_cargado(self):
+        """Carga el índice si todavía no se cargó. Conviene llamarlo fuera del hilo de la interfaz."""
+        if not self.cargado:
+            self.cargar()
+
+    def refrescar(self, codigos):
+        """Vuelve a indexar los productos con esos códigos de barras, tras darlos de alta o modificarlos."""
+        if not self.cargado or not codigos:
+            return
+        marcadores = ", ".join(["%s"] * len(codigos))
+        productos = self._leer_productos(f"WHERE codigo_barras IN ({marcadores})", tuple(codigos))
+        with self._lock:
+            for producto in productos:
+                self._indexar(producto)
+
+    def quitar(self, id_producto):
+        with self._lock:
+            self._quitar(id_producto)
+
+    def subcadena(self, consulta):
+        """
+        Devuelve el set de ids cuyo nombre, código o SKU contiene `consulta`.
+        Con una consulta de 1 o 2 caracteres solo se encuentran comienzos de palabra.
+        """
+        consulta = normalizar(consulta)
+        if not consulta:
+            return set(self._textos)
+        with self._lock:
+            if len(consulta) < 3:
+                return set(self._listas.get(("  " + consulta)[-3:], ()))
+            listas = [self._listas.get(t) for t in _trigramas_subcadena(consulta)]
+            if not all(listas):
+                return set()
+            listas.sort(key=len) # Se intersecta empezando por la lista más corta
+            candidatos = set(listas[0])
+            for ids in listas[1:]:
+                candidatos &= ids
+                if not candidatos:
+                    break
+            return {i for i in candidatos if consulta in self._textos[i]}
+
+    def buscar(self, consulta, limite=50):
+        """
+        Devuelve hasta `limite` ids (todos si es None) ordenados por relevancia. Primero los que contienen la consulta
+        tal cual, luego los que comparten más trigramas con ella (así "coka" encuentra "coca").
+        """
+        consulta = normalizar(consulta)
+        if not consulta:
+            return []
+        trigramas = _trigramas_subcadena(consulta) | _trigramas_palabras(consulta)
+        with self._lock:
+            coincidencias = Counter()
+            for trigrama in trigramas:
+                coincidencias.update(self._listas.get(trigrama, ()))
+            minimo = max(1, int(len(trigramas) * self.SIMILITUD_MINIMA))
+
+            ranking = []
+            for id_producto, comunes in coincidencias.items():
+                exacto = consulta in self._textos[id_producto]
+                if not exacto and comunes < minimo:
+                    continue
+                similitud = comunes / (len(trigramas) + len(self._trigramas[id_producto]) - comunes)
+                ranking.append((not exacto, -similitud, len(self._nombres[id_producto]), id_producto))
+        ranking.sort()
+        return [fila[-1] for fila in ranking[:limite]]
+
+    def estadisticas(self):
+        with self._lock:
+            return {'productos': len(self._textos), 'trigramas': len(self._listas)}
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+def obtener_indice(db_config):
+    """Devuelve el índice del proceso para esta configuración, creándolo la primera vez."""
+    clave = tuple(sorted(db_config.items()))
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = IndiceTrigramas(dict(db_config))
+            _indices[clave] = indice
+        return indice
@@ -3,19 +3,25 @@
 import sys
 import traceback
 import mysql.connector.plugins.caching_sha2_password
-import pandas as pd
-from tkinter import filedialog
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import mysql.connector
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import configparser
-import win32print
+import time
+import logging
 from PIL import Image, ImageTk
 import ctypes
 
-from database import inicializar_base_datos
+from database import Database, sumar_venta_al_resumen
+from migraciones import inicializar_base_datos
+from catalogo import obtener_catalogo
+from carrito import Carrito, LineaCarrito
+from dinero import CERO, a_dinero
+from tareas import obtener_ejecutor
+from impresion import ColaImpresion, crear_impresora
+from ticket import PlantillaTicket, rasterizar_logo
 from utils import resolver_ruta
 
 # Importaciones de las ventanas
@@ -26,6 +32,12 @@ from windows.cobro import VentanaCobro
 from windows.granel import VentanaVentaGranel
 from windows.no_encontrado import VentanaProductoNoEncontrado
 from windows.gestion_atributos import VentanaGestionAtributos
+from windows.exportacion import VentanaExportacionVentas
+
+log = logging.getLogger(__name__)
+
+# Datos del local impresos en la cabecera del ticket.
+ENCABEZADO_TICKET = ["B Sefair Mna F Casa 1", "Calle Juan Jufre pasando Alem", "Villa del Salvador Angaco"]
 
 class SistemaVentas:
     """
@@ -40,8 +52,8 @@ class SistemaVentas:
         self.root = root
         self.root.title("PUNTO DE VENTA")
         self.root.state('zoomed') # Maximiza la ventana al iniciar.
-        self.carrito = [] # Lista para almacenar los productos de la venta actual.
-        self.total_acumulado = 0.0 # Variable para llevar la suma del total de la venta.
+        self.carrito = Carrito() # Productos de la venta actual, con el total acumulado.
+        self.ultimo_tiempo_commit = None # Segundos que tardó en guardarse la última venta.
         
         # Configuración del ícono de la aplicación para la barra de tareas de Windows.
         try:
@@ -66,10 +78,32 @@ class SistemaVentas:
 
         # Asegura que la base de datos y las tablas existan antes de continuar.
         self.inicializar_base_datos_segura()
+
+        # Plantilla del ticket: el logo y la cabecera se codifican una sola vez.
+        self.plantilla_ticket = PlantillaTicket(ENCABEZADO_TICKET, logo=self.obtener_bytes_imagen("logo_ticket.png"))
+
+        # Ejecutor que corre las consultas fuera del hilo de la interfaz.
+        self.ejecutor = obtener_ejecutor(self.root)
+
+        # Cola de impresión con su propio hilo: el ticket no demora la siguiente venta.
+        self.cola_impresion = ColaImpresion(
+            crear_impresora(self.config_impresion),
+            al_fallar=lambda e: self.ejecutor.llamar_en_ui(self.avisar_fallo_impresion, e)
+        )
+
+        # Carga el catálogo de productos en memoria para resolver los escaneos sin ir a la BD.
+        self.catalogo = obtener_catalogo(self.db_config)
+        try:
+            self.catalogo.cargar()
+        except Exception as e:
+            print(f"No se pudo precargar el catálogo de productos: {e}")
         
         # Llama al método que crea todos los elementos visuales de la ventana principal.
         self.construir_interfaz()
 
+        # Tickets que fallaron en una ejecución anterior: se ofrece reenviarlos una vez abierta la ventana.
+        self.root.after(500, self.avisar_fallo_impresion)
+
     def construir_interfaz(self):
         """
         Crea y organiza todos los widgets (elementos visuales) de la ventana principal.
@@ -102,8 +136,9 @@ class SistemaVentas:
         tk.Button(frame_acciones, text="📦 Inventario", font=self.FONT_BOLD, relief="raised", bd=4, bg="white", command=self.abrir_lista_inventario).pack(side="left", padx=5)
         tk.Button(frame_acciones, text="➕ Nuevo Producto", font=self.FONT_BOLD, relief="raised", bd=4, bg="white", command=self.abrir_inventario).pack(side="left", padx=5)
         tk.Button(frame_acciones, text="🔍 Buscar Producto", font=self.FONT_BOLD, relief="raised", bd=4, bg="#ffc107", command=self.abrir_busqueda_producto).pack(side="left", padx=5)
-        tk.Button(frame_acciones, text="📊 Exportar Ventas Hoy", font=self.FONT_BOLD, bg="#217346", fg="white", relief="raised", bd=4, command=self.exportar_ventas_excel).pack(side="left", padx=5, ipady=5)
+        tk.Button(frame_acciones, text="📊 Exportar Ventas", font=self.FONT_BOLD, bg="#217346", fg="white", relief="raised", bd=4, command=self.exportar_ventas_excel).pack(side="left", padx=5, ipady=5)
         tk.Button(frame_acciones, text="⚙️ Gestionar Atributos", font=self.FONT_BOLD, bg="#6c757d", fg="white", relief="raised", bd=4, command=self.abrir_gestion_atributos).pack(side="left", padx=5, ipady=5)
+        tk.Button(frame_acciones, text="🧾 Reimprimir Ticket", font=self.FONT_BOLD, bg="white", relief="raised", bd=4, command=self.reimprimir_ticket).pack(side="left", padx=5)
 
         # --- Frame de Escaneo de Productos ---
         frame_scan = tk.Frame(self.root, bg=self.COLOR_FONDO, pady=10)
@@ -163,17 +198,12 @@ class SistemaVentas:
         VentanaGestionAtributos(self.root, self.db_config)
 
     def inicializar_base_datos_segura(self):
-        """Se conecta solo al servidor MySQL para verificar que la BD exista, y si no, la crea."""
-        config_servidor = self.db_config.copy()
-        nombre_bd = config_servidor.pop('database', 'punto_venta')
+        """
+        Verifica que la BD exista (y si no, la crea) y aplica las migraciones de esquema pendientes.
+        Si no hay ninguna nueva, solo lee la versión guardada en `schema_version`.
+        """
+        self.db_config.setdefault('database', 'punto_venta')
         try:
-            conexion_temp = mysql.connector.connect(**config_servidor)
-            cursor = conexion_temp.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {nombre_bd}")
-            conexion_temp.commit()
-            cursor.close()
-            conexion_temp.close()
-            # Una vez creada la BD (si no existía), se inicializan/actualizan las tablas
             inicializar_base_datos(self.db_config)
         except mysql.connector.Error as err:
             messagebox.showerror("Error Crítico de Base de Datos", f"No se pudo conectar al servidor MySQL.\nVerifique que XAMPP u otro servidor esté activo.\nDetalle: {err}")
@@ -187,7 +217,10 @@ class SistemaVentas:
             config.read('config.ini')
             db_conf = dict(config['mysql'])
             db_conf['port'] = int(db_conf['port'])
-            self.nombre_impresora_config = config['impresion']['nombre_impresora']
+            self.config_impresion = dict(config['impresion'])
+            self.config_busqueda = dict(config['busqueda']) if config.has_section('busqueda') else {}
+            self.config_exportacion = dict(config['exportacion']) if config.has_section('exportacion') else {}
+            self.nombre_impresora_config = self.config_impresion['nombre_impresora']
             return db_conf
         except Exception as e:
             messagebox.showerror("Error Fatal", f"No se pudo leer el archivo 'config.ini' o está incompleto: {e}")
@@ -195,12 +228,7 @@ class SistemaVentas:
 
     def agregar_producto_granel(self, producto_bd, precio_venta):
         """Agrega un producto vendido a granel (por precio) al carrito de compras."""
-        nuevo_item = {
-            'id': producto_bd['id'], 'codigo': producto_bd['codigo_barras'], 'nombre': producto_bd['nombre'],
-            'precio': float(precio_venta), 'cantidad': 1, 'subtotal': float(precio_venta),
-            'tipo': producto_bd.get('tipo', 'Unidad'), 'sku': producto_bd.get('sku', '')
-        }
-        self.carrito.append(nuevo_item)
+        self.carrito.agregar_granel(producto_bd, precio_venta)
         self.actualizar_carrito_visual()
         self.entry_codigo.delete(0, tk.END)
 
@@ -208,32 +236,24 @@ class SistemaVentas:
         """
         Busca un producto por código de barras. Si existe, lo procesa.
         Si no existe, busca por SKU. Si aún no lo encuentra, abre un diálogo con opciones para el usuario.
+        La búsqueda corre en segundo plano por el canal "caja", de modo que los escaneos se agregan
+        al carrito en el mismo orden en que se leyeron aunque la BD responda lento.
         """
         codigo = self.entry_codigo.get().strip()
         if not codigo: return
 
-        producto_bd = None
-        try:
-            conexion = mysql.connector.connect(**self.db_config)
-            cursor = conexion.cursor(dictionary=True)
-
-            # 1. Search by codigo_barras
-            cursor.execute("SELECT * FROM productos WHERE codigo_barras = %s", (codigo,))
-            producto_bd = cursor.fetchone()
-
-            # 2. If not found by barcode, search by SKU
-            if not producto_bd:
-                cursor.execute("SELECT * FROM productos WHERE sku = %s", (codigo,))
-                producto_bd = cursor.fetchone()
-
-            cursor.close()
-            conexion.close()
-        except mysql.connector.Error as err:
-            messagebox.showerror("Error de Base de Datos", f"No se pudo consultar: {err}")
-            return
-
+        # Se libera el campo enseguida para no perder el próximo escaneo.
         self.entry_codigo.delete(0, tk.END)
 
+        # Busca por código de barras y luego por SKU en el catálogo en memoria.
+        self.ejecutor.enviar(
+            self.catalogo.buscar, codigo, canal="caja",
+            al_terminar=lambda producto_bd: self.procesar_producto_escaneado(codigo, producto_bd),
+            al_fallar=lambda err: messagebox.showerror("Error de Base de Datos", f"No se pudo consultar: {err}")
+        )
+
+    def procesar_producto_escaneado(self, codigo, producto_bd):
+        """Agrega al carrito el producto encontrado por `buscar_producto` o informa que no existe."""
         if not producto_bd:
             dialog = VentanaProductoNoEncontrado(self.root, codigo)
             self.root.wait_window(dialog.top)
@@ -248,191 +268,231 @@ class SistemaVentas:
         elif producto_bd['stock_actual'] <= 0:
             messagebox.showwarning("Stock Agotado", "No queda stock para este producto.")
         else:
-            encontrado = next((item for item in self.carrito if item['id'] == producto_bd['id']), None)
-            if encontrado:
-                encontrado['cantidad'] += 1
-                encontrado['subtotal'] = encontrado['cantidad'] * encontrado['precio']
-            else:
-                nuevo_item = {
-                    'id': producto_bd['id'], 'codigo': producto_bd['codigo_barras'], 'nombre': producto_bd['nombre'],
-                    'precio': float(producto_bd['precio_venta']), 'cantidad': 1, 'subtotal': float(producto_bd['precio_venta']),
-                    'tipo': producto_bd.get('tipo', 'Unidad')
-                }
-                self.carrito.append(nuevo_item)
+            self.carrito.agregar_unidad(producto_bd)
             self.actualizar_carrito_visual()
 
     def actualizar_carrito_visual(self):
-        """Limpia y redibuja la tabla del carrito con los datos actuales y actualiza el total."""
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        self.total_acumulado = 0.0
-        for item in self.carrito:
-            self.tree.insert("", "end", values=(
-                item['codigo'], item['nombre'], f"${item['precio']:.2f}",
-                item['cantidad'], f"${item['subtotal']:.2f}"
-            ), tags=('normal_row',))
-            self.total_acumulado += item['subtotal']
-        self.lbl_total.config(text=f"TOTAL: ${self.total_acumulado:.2f}")
+        """
+        Redibuja solo las líneas del carrito que cambiaron desde la última llamada y actualiza el total.
+        Las líneas nuevas se insertan al final de la tabla; las existentes se modifican en su lugar.
+        """
+        modificadas, eliminadas = self.carrito.tomar_cambios()
+        for iid in eliminadas:
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+        for linea in modificadas:
+            valores = (linea.codigo, linea.nombre, f"${linea.precio:.2f}", linea.cantidad, f"${linea.subtotal:.2f}")
+            if self.tree.exists(linea.iid):
+                self.tree.item(linea.iid, values=valores)
+            else:
+                self.tree.insert("", "end", iid=linea.iid, values=valores, tags=('normal_row',))
+        self.lbl_total.config(text=f"TOTAL: ${self.carrito.total:.2f}")
 
     def guardar_venta(self):
         """Inicia el proceso de cobro abriendo la VentanaCobro si el carrito no está vacío."""
+        # Se espera a que terminen los escaneos en curso para cobrar el carrito completo.
+        self.ejecutor.enviar(lambda: None, canal="caja", al_terminar=lambda _: self.abrir_cobro())
+
+    def abrir_cobro(self):
         if not self.carrito:
             messagebox.showinfo("Vacío", "No hay productos para cobrar.")
             return
-        VentanaCobro(self.root, self.total_acumulado, self.guardar_venta_bd)
+        VentanaCobro(self.root, self.carrito.total, self.guardar_venta_bd)
 
     def guardar_venta_bd(self, metodo_pago, pago_cliente, vuelto, total_cobrado=None):
         """
         Guarda la venta en la base de datos (tablas ventas y detalle_ventas) y actualiza el stock.
         Luego, pregunta si se desea imprimir el ticket y limpia la interfaz.
+        La escritura corre en segundo plano; los escaneos posteriores esperan a que termine.
+        """
+        if total_cobrado is None: total_cobrado = self.carrito.total
+        venta = self.carrito.copia()
+
+        def al_terminar(resultado):
+            id_venta_generado, sin_stock, precios_nuevos = resultado
+            if sin_stock:
+                messagebox.showwarning("Stock Insuficiente", "No hay stock suficiente para:\n" + "\n".join(sin_stock))
+                return
+            if precios_nuevos:
+                # Otra terminal cambió precios: se actualiza el carrito y se vuelve a cobrar con el total nuevo.
+                cambios = []
+                for id_producto, precio in precios_nuevos.items():
+                    linea = self.carrito.actualizar_precio(id_producto, precio)
+                    if linea:
+                        cambios.append(f"{linea.nombre}: ${precio:.2f}")
+                self.actualizar_carrito_visual()
+                messagebox.showwarning("Precios Actualizados", "Cambió el precio de:\n" + "\n".join(cambios) + "\n\nLa venta no se guardó; cobre nuevamente.")
+                return
+            if messagebox.askquestion("Imprimir", "¿Desea imprimir el ticket?") == 'yes':
+                self.generar_ticket(id_venta_generado, pago_cliente, vuelto)
+            self.limpiar_pantalla()
+
+        self.ejecutor.enviar(
+            self.persistir_venta, venta, metodo_pago, pago_cliente, vuelto, total_cobrado, canal="caja",
+            al_terminar=al_terminar,
+            al_fallar=lambda e: messagebox.showerror("Error Crítico", f"No se pudo guardar la venta: {e}")
+        )
+
+    def persistir_venta(self, venta, metodo_pago, pago_cliente, vuelto, total_cobrado):
         """
-        if total_cobrado is None: total_cobrado = self.total_acumulado
+        Escribe la venta en una sola transacción. Se ejecuta fuera del hilo de la interfaz.
+        Devuelve `(id_venta, sin_stock, precios_nuevos)`. Si `sin_stock` (textos) o `precios_nuevos`
+        ({id de producto: precio actual}, para los productos cuyo precio cambió en la BD desde que se
+        escanearon) no están vacíos, la venta no se guardó.
+        La cantidad de sentencias no depende del tamaño del carrito: un INSERT multi-fila para el
+        detalle y un único UPDATE para todo el stock. El resumen diario se actualiza en la misma transacción.
+        """
+        inicio = time.perf_counter()
+        db = Database(self.db_config)
         try:
-            conexion = mysql.connector.connect(**self.db_config)
-            cursor = conexion.cursor()
+            db.connect()
+            conexion, cursor = db.connection, db.cursor
+
+            # El stock y el precio del catálogo en memoria pueden estar desactualizados: se verifican contra
+            # la BD bloqueando las filas hasta el commit para que otra terminal no venda el mismo stock.
+            cantidades = venta.cantidades_por_producto()
+            if cantidades:
+                marcadores = ", ".join(["%s"] * len(cantidades))
+                cursor.execute(f"SELECT id, nombre, stock_actual, precio_venta FROM productos WHERE id IN ({marcadores}) FOR UPDATE", tuple(cantidades))
+                filas = cursor.fetchall()
+                sin_stock = [f"{fila['nombre']} (quedan {fila['stock_actual']})" for fila in filas if fila['stock_actual'] < cantidades[fila['id']]]
+                precios_venta = {linea.id: linea.precio for linea in venta if linea.es_unidad()}
+                precios_nuevos = {fila['id']: a_dinero(fila['precio_venta']) for fila in filas if a_dinero(fila['precio_venta']) != precios_venta[fila['id']]}
+                if sin_stock or precios_nuevos:
+                    conexion.rollback()
+                    self.catalogo.invalidar(ids=cantidades)
+                    return None, sin_stock, precios_nuevos
 
             sql_venta = "INSERT INTO ventas (total, pago_con, vuelto, metodo_pago, fecha_venta) VALUES (%s, %s, %s, %s, NOW())"
             cursor.execute(sql_venta, (total_cobrado, pago_cliente, vuelto, metodo_pago))
             id_venta_generado = cursor.lastrowid
 
+            # executemany con un INSERT ... VALUES se envía como un único INSERT multi-fila.
             sql_detalle = "INSERT INTO detalle_ventas (id_venta, id_producto, cantidad, precio_unitario, subtotal) VALUES (%s, %s, %s, %s, %s)"
-            sql_stock = "UPDATE productos SET stock_actual = stock_actual - %s WHERE id = %s"
+            cursor.executemany(sql_detalle, [(id_venta_generado, linea.id, linea.cantidad, linea.precio, linea.subtotal) for linea in venta])
 
-            for item in self.carrito:
-                cursor.execute(sql_detalle, (id_venta_generado, item['id'], item['cantidad'], item['precio'], item['subtotal']))
-                if item.get('tipo', 'Unidad').lower().startswith('unidad'):
-                    cursor.execute(sql_stock, (item['cantidad'], item['id']))
+            # Descuenta el stock de todos los productos por unidad con un solo UPDATE contra una tabla derivada.
+            if cantidades:
+                tabla_cantidades = " UNION ALL ".join(["SELECT %s AS id, %s AS cantidad"] * len(cantidades))
+                sql_stock = f"UPDATE productos p JOIN ({tabla_cantidades}) c ON p.id = c.id SET p.stock_actual = p.stock_actual - c.cantidad"
+                cursor.execute(sql_stock, tuple(valor for par in cantidades.items() for valor in par))
 
-            conexion.commit()
-            cursor.close()
-            conexion.close()
+            sumar_venta_al_resumen(cursor, id_venta_generado)
 
-            if messagebox.askquestion("Imprimir", "¿Desea imprimir el ticket?") == 'yes':
-                self.generar_ticket(id_venta_generado, pago_cliente, vuelto)
-            
-            self.limpiar_pantalla()
-        except Exception as e:
-            messagebox.showerror("Error Crítico", f"No se pudo guardar la venta: {e}")
+            conexion.commit()
+            self.catalogo.invalidar(ids=cantidades) # El stock de estos productos cambió
+            self.ultimo_tiempo_commit = time.perf_counter() - inicio
+            log.info("Venta %s guardada en %.1f ms (%d líneas).", id_venta_generado, self.ultimo_tiempo_commit * 1000, len(venta))
+            return id_venta_generado, [], {}
+        finally:
+            db.disconnect()
 
     def eliminar_producto(self, event):
         """Elimina el producto seleccionado del carrito de compras."""
         seleccion = self.tree.selection()
         if not seleccion: return
         
-        index = self.tree.index(seleccion[0])
-        del self.carrito[index]
+        self.carrito.quitar(seleccion[0])
         self.actualizar_carrito_visual()
         self.entry_codigo.focus_set()
 
     def generar_ticket(self, id_venta, pago, vuelto):
         """
-        Genera el contenido del ticket en formato ESC/POS y lo envía a la impresora configurada.
+        Genera el contenido del ticket en formato ESC/POS y lo deja en la cola de impresión.
         """
-        CMD_INIT = b'\x1b@'; CMD_CENTER = b'\x1b\x61\x01'; CMD_LEFT = b'\x1b\x61\x00'; CMD_CUT = b'\x1d\x56\x00'
-        ticket_bytes = b""
-        
+        ticket_bytes = self.plantilla_ticket.renderizar(id_venta, datetime.now(), self.carrito, self.carrito.total, pago, vuelto)
         try:
-            bytes_logo = self.obtener_bytes_imagen("logo_ticket.png")
-            if bytes_logo:
-                ticket_bytes += bytes_logo + b"\n"
+            self.cola_impresion.encolar(ticket_bytes, f"Ticket{id_venta}")
         except Exception as e:
-            print(f"No se pudo agregar el logo al ticket: {e}")
-
-        ticket_bytes += CMD_INIT + CMD_CENTER + b"B Sefair Mna F Casa 1\n" + CMD_LEFT
-        ticket_bytes += CMD_INIT + CMD_CENTER + b"Calle Juan Jufre pasando Alem\n" + CMD_LEFT
-        ticket_bytes += CMD_INIT + CMD_CENTER + b"Villa del Salvador Angaco\n" + CMD_LEFT
-        ticket_bytes += b"--------------------------------\n"
-        ticket_bytes += f"Fecha: {datetime.now().strftime('%d/%m/%Y %H:%M')}\n".encode('latin-1')
-        ticket_bytes += f"Ticket Nro: {id_venta}\n".encode('latin-1')
-        ticket_bytes += b"--------------------------------\n"
-
-        for item in self.carrito:
-            nombre = item['nombre'][:32].upper()
-            linea_precio = f"{item['cantidad']} x ${item['precio']:.2f}    ${item['subtotal']:.2f}"
-            ticket_bytes += f"{nombre}\n".encode('latin-1')
-            ticket_bytes += f"{linea_precio}\n".encode('latin-1')
-
-        ticket_bytes += b"--------------------------------\n"
-        ticket_bytes += CMD_CENTER + f"TOTAL: ${self.total_acumulado:.2f}\n".encode('latin-1') + CMD_LEFT
-        ticket_bytes += f"PAGO:   ${pago:.2f}\n".encode('latin-1')
-        ticket_bytes += f"VUELTO: ${vuelto:.2f}\n".encode('latin-1')
-        ticket_bytes += b"\n" + CMD_CENTER + b"GRACIAS POR SU COMPRA\n\n\n" + CMD_CUT
+            messagebox.showerror("Error de Impresión", f"No se pudo imprimir el ticket:\n{e}")
 
+    def avisar_fallo_impresion(self, error=None):
+        """
+        Avisa que hay tickets que no se pudieron imprimir y ofrece reenviarlos.
+        Se llama cuando un trabajo agota sus intentos y al iniciar si quedaron fallidos de antes.
+        """
+        cantidad = self.cola_impresion.fallidos()
+        if not cantidad:
+            return
+        detalle = f"\n{error}" if error else ""
+        if messagebox.askretrycancel("Error de Impresión", f"Hay {cantidad} ticket(s) que no se pudieron imprimir.{detalle}\n\nRevise la impresora y presione Reintentar."):
+            self.cola_impresion.reintentar_fallidos()
+
+    def reimprimir_ticket(self):
+        """Pide un número de ticket, muestra su vista previa y lo vuelve a imprimir."""
+        id_venta = simpledialog.askinteger("Reimprimir Ticket", "Número de ticket:", parent=self.root, minvalue=1)
+        if not id_venta: return
+
+        def al_consultar(resultado):
+            venta, lineas = resultado
+            if not venta:
+                messagebox.showinfo("Reimprimir Ticket", f"No existe el ticket Nro {id_venta}.")
+                return
+            # El ticket original imprime el total del carrito (suma de las líneas, sin el recargo de la tarjeta)
+            total = sum((linea.subtotal for linea in lineas), CERO)
+            datos = (id_venta, venta['fecha_venta'], lineas, total, venta['pago_con'], venta['vuelto'])
+            if messagebox.askyesno("Reimprimir Ticket", self.plantilla_ticket.renderizar_texto(*datos)):
+                try:
+                    self.cola_impresion.encolar(self.plantilla_ticket.renderizar(*datos), f"Ticket{id_venta}")
+                except Exception as e:
+                    messagebox.showerror("Error de Impresión", f"No se pudo imprimir el ticket:\n{e}")
+
+        self.ejecutor.enviar(
+            self.consultar_venta, id_venta, al_terminar=al_consultar,
+            al_fallar=lambda e: messagebox.showerror("Error de Base de Datos", f"No se pudo consultar el ticket: {e}")
+        )
+
+    def consultar_venta(self, id_venta):
+        """Devuelve `(venta, lineas)` de una venta guardada, con las líneas como `LineaCarrito`."""
+        db = Database(self.db_config)
         try:
-            hPrinter = win32print.OpenPrinter(self.nombre_impresora_config)
-            hJob = win32print.StartDocPrinter(hPrinter, 1, ("Ticket", None, "RAW"))
-            win32print.WritePrinter(hPrinter, ticket_bytes)
-            win32print.EndDocPrinter(hJob)
-            win32print.ClosePrinter(hPrinter)
-        except Exception as e:
-            messagebox.showerror("Error de Impresión", f"No se pudo imprimir el ticket:\n{e}")
+            db.connect()
+            venta = db.fetchone("SELECT id, fecha_venta, total, pago_con, vuelto FROM ventas WHERE id = %s", (id_venta,))
+            if not venta:
+                return None, []
+            filas = db.fetchall(
+                "SELECT dv.id, dv.id_producto, p.codigo_barras, p.nombre, dv.cantidad, dv.precio_unitario, dv.subtotal, p.tipo, p.sku "
+                "FROM detalle_ventas dv JOIN productos p ON dv.id_producto = p.id WHERE dv.id_venta = %s ORDER BY dv.id", (id_venta,))
+            lineas = []
+            for fila in filas:
+                linea = LineaCarrito(f"D{fila['id']}", fila['id_producto'], fila['codigo_barras'], fila['nombre'],
+                                     fila['precio_unitario'], fila['cantidad'], fila['tipo'], fila['sku'])
+                linea.subtotal = fila['subtotal'] # Se respeta el importe guardado
+                lineas.append(linea)
+            return venta, lineas
+        finally:
+            db.disconnect()
 
     def obtener_bytes_imagen(self, ruta_imagen):
-        """Convierte un archivo de imagen a bytes en formato ESC/POS para impresoras térmicas."""
+        """
+        Convierte un archivo de imagen a bytes en formato ESC/POS para impresoras térmicas.
+        La conversión se hace una sola vez y queda en caché (ver `ticket.rasterizar_logo`).
+        """
         try:
-            img = Image.open(resolver_ruta(ruta_imagen)).resize((370, int(370 * Image.open(resolver_ruta(ruta_imagen)).size[1] / Image.open(resolver_ruta(ruta_imagen)).size[0])), Image.LANCZOS).convert("1")
-            ancho_bytes = (img.width + 7) // 8
-            datos_imagen = b""
-            datos_pixels = list(img.getdata())
-            
-            for y in range(img.height):
-                fila_bytes = bytearray(ancho_bytes)
-                for x in range(img.width):
-                    if datos_pixels[y * img.width + x] == 0:
-                        fila_bytes[x // 8] |= (1 << (7 - (x % 8)))
-                datos_imagen += fila_bytes
-
-            comando = b'\x1d\x76\x30\x00' + (ancho_bytes % 256).to_bytes(1, 'little') + (ancho_bytes // 256).to_bytes(1, 'little') + (img.height % 256).to_bytes(1, 'little') + (img.height // 256).to_bytes(1, 'little') + datos_imagen
-            return comando
+            return rasterizar_logo(resolver_ruta(ruta_imagen))
         except Exception as e:
             print(f"No se pudo procesar la imagen del ticket: {e}")
             return b""
 
     def limpiar_pantalla(self):
         """Limpia el carrito de compras, la tabla visual y el total, preparando para una nueva venta."""
-        self.carrito = []
-        self.total_acumulado = 0.0
+        self.carrito = Carrito()
         self.lbl_total.config(text="TOTAL: $0.00")
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*self.tree.get_children())
 
     def exportar_ventas_excel(self):
-        """Exporta los detalles de las ventas del día comercial actual a un archivo Excel."""
-        try:
-            ahora = datetime.now()
-            HORA_CORTE = 6 
-            fecha_inicio = (ahora - timedelta(days=1)).replace(hour=HORA_CORTE, minute=0, second=0) if ahora.hour < HORA_CORTE else ahora.replace(hour=HORA_CORTE, minute=0, second=0)
-            
-            conexion = mysql.connector.connect(**self.db_config)
-            query = "SELECT v.id AS 'Nro Ticket', v.fecha_venta AS 'Fecha Hora', p.codigo_barras AS 'Código', p.nombre AS 'Producto', dv.cantidad AS 'Cantidad', dv.precio_unitario AS 'Precio Unit.', dv.subtotal AS 'Subtotal', v.metodo_pago AS 'Método Pago', v.pago_con AS 'Pago Con', v.vuelto AS 'Vuelto' FROM ventas v JOIN detalle_ventas dv ON v.id = dv.id_venta JOIN productos p ON dv.id_producto = p.id WHERE v.fecha_venta BETWEEN %s AND %s ORDER BY v.id DESC"
-            df = pd.read_sql(query, conexion, params=(fecha_inicio, ahora))
-            conexion.close()
-
-            if df.empty:
-                messagebox.showinfo("Sin Datos", "No hay ventas para exportar en el período actual.")
-                return
-
-            fecha_str = ahora.strftime("%Y-%m-%d")
-            ruta_guardado = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=f"Cierre_Caja_{fecha_str}.xlsx", filetypes=[("Excel files", "*.xlsx")])
-            if not ruta_guardado: return
-            
-            with pd.ExcelWriter(ruta_guardado, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='VentasDetallado')
-                
-                resumen = df.groupby('Método Pago')['Subtotal'].sum().reset_index()
-                resumen.to_excel(writer, index=False, sheet_name='ResumenMetodoPago')
-
-                total_ventas = pd.DataFrame([{'Total General Vendido': df['Subtotal'].sum()}])
-                total_ventas.to_excel(writer, index=False, sheet_name='TotalGeneral')
-
-            messagebox.showinfo("Éxito", f"Archivo Excel exportado con éxito en:\n{ruta_guardado}")
-
-        except Exception as e:
-            messagebox.showerror("Error de Exportación", f"No se pudo generar el archivo Excel: {e}")
+        """
+        Abre la ventana de exportación de ventas (por defecto, el día comercial actual).
+        El formato inicial se toma de `formato` en la sección [exportacion] de config.ini.
+        """
+        VentanaExportacionVentas(self.root, self.db_config, self.ejecutor,
+                                 formato=self.config_exportacion.get('formato', 'xlsx').strip().lower())
 
     def abrir_busqueda_producto(self):
         """Abre la ventana de búsqueda de productos para agregar al carrito."""
-        VentanaBusquedaProducto(self.root, self.db_config, self.agregar_producto_al_carrito_desde_busqueda)
+        VentanaBusquedaProducto(self.root, self.db_config, self.agregar_producto_al_carrito_desde_busqueda,
+                                modo=self.config_busqueda.get('modo', 'trigramas').strip().lower(),
+                                max_resultados=int(self.config_busqueda.get('max_resultados', 500)))
 
     def agregar_producto_al_carrito_desde_busqueda(self, producto_bd):
         """
@@ -447,23 +507,7 @@ class SistemaVentas:
         elif producto_bd['stock_actual'] <= 0:
             messagebox.showwarning("Stock Agotado", f"No queda stock para el producto:\n{producto_bd['nombre']}")
         else:
-            encontrado = next((item for item in self.carrito if item['id'] == producto_bd['id']), None)
-            if encontrado:
-                encontrado['cantidad'] += 1
-                encontrado['subtotal'] = encontrado['cantidad'] * encontrado['precio']
-            else:
-                nuevo_item = {
-                    'id': producto_bd['id'],
-                    'codigo': producto_bd['codigo_barras'],
-                    'nombre': producto_bd['nombre'],
-                    'precio': float(producto_bd['precio_venta']),
-                    'cantidad': 1,
-                    'subtotal': float(producto_bd['precio_venta']),
-                    'tipo': producto_bd.get('tipo', 'Unidad'),
-                    'sku': producto_bd.get('sku', '')
-                }
-                self.carrito.append(nuevo_item)
-            
+            self.carrito.agregar_unidad(producto_bd)
             self.actualizar_carrito_visual()
         
         self.entry_codigo.focus_set()
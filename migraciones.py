@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+import mysql.connector
+from mysql.connector import errorcode
+from database import obtener_pool, asegurar_indice, refrescar_productos_busqueda, reconstruir_resumen_diario
+
+# Cada cambio de estructura es una migración numerada. La versión aplicada se guarda en `schema_version`,
+# así que al iniciar solo se lee `MAX(version)` y se ejecutan las migraciones posteriores, en orden.
+# Para cambiar el esquema se agrega una función al final de `MIGRACIONES`; nunca se modifican las ya publicadas.
+# Las primeras son idempotentes porque una base existente sin `schema_version` las ejecuta todas una vez.
+
+def _tablas_iniciales(cursor, db_name):
+    tablas = {}
+    tablas['rubro'] = """
+        CREATE TABLE IF NOT EXISTS rubro (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(50) COLLATE utf8mb4_unicode_ci UNIQUE NOT NULL
+        ) ENGINE=InnoDB;
+    """
+    tablas['familia'] = """
+        CREATE TABLE IF NOT EXISTS familia (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            rubro_id INT,
+            nombre VARCHAR(50) COLLATE utf8mb4_unicode_ci UNIQUE NOT NULL,
+            FOREIGN KEY (rubro_id) REFERENCES rubro(id) ON DELETE SET NULL
+        ) ENGINE=InnoDB;
+    """
+    tablas['marca'] = """
+        CREATE TABLE IF NOT EXISTS marca (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(50) COLLATE utf8mb4_unicode_ci UNIQUE NOT NULL
+        ) ENGINE=InnoDB;
+    """
+    tablas['valores_atributos'] = """
+        CREATE TABLE IF NOT EXISTS valores_atributos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            valor VARCHAR(50) COLLATE utf8mb4_unicode_ci UNIQUE NOT NULL
+        ) ENGINE=InnoDB;
+    """
+    tablas['definicion_atributos'] = """
+        CREATE TABLE IF NOT EXISTS definicion_atributos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            familia_id INT UNIQUE,
+            label_atributo_1 VARCHAR(50),
+            label_atributo_2 VARCHAR(50),
+            FOREIGN KEY (familia_id) REFERENCES familia(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB;
+    """
+    tablas['producto_sku'] = """
+        CREATE TABLE IF NOT EXISTS producto_sku (
+            sku VARCHAR(12) PRIMARY KEY,
+            familia_id INT,
+            marca_id INT,
+            atributo_1_id INT,
+            atributo_2_id INT,
+            FOREIGN KEY (familia_id) REFERENCES familia(id),
+            FOREIGN KEY (marca_id) REFERENCES marca(id),
+            FOREIGN KEY (atributo_1_id) REFERENCES valores_atributos(id),
+            FOREIGN KEY (atributo_2_id) REFERENCES valores_atributos(id)
+        ) ENGINE=InnoDB;
+    """
+    tablas['productos'] = """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            codigo_barras VARCHAR(50) UNIQUE NOT NULL,
+            nombre VARCHAR(100) NOT NULL,
+            precio_venta DECIMAL(10,2) DEFAULT 0.00,
+            stock_actual INT DEFAULT 0,
+            tipo VARCHAR(10) DEFAULT 'Unidad',
+            sku VARCHAR(12) UNIQUE NULL,
+            FOREIGN KEY (sku) REFERENCES producto_sku(sku) ON DELETE SET NULL
+        ) ENGINE=InnoDB;
+    """
+    tablas['ventas'] = """
+        CREATE TABLE IF NOT EXISTS ventas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            fecha DATETIME DEFAULT CURRENT_TIMESTAMP,
+            total DECIMAL(10,2),
+            metodo_pago VARCHAR(50) DEFAULT 'Efectivo'
+        ) ENGINE=InnoDB;
+    """
+    tablas['detalle_ventas'] = """
+        CREATE TABLE IF NOT EXISTS detalle_ventas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            id_venta INT,
+            id_producto INT,
+            cantidad INT,
+            precio_unitario DECIMAL(10,2),
+            subtotal DECIMAL(10,2),
+            FOREIGN KEY (id_venta) REFERENCES ventas(id),
+            FOREIGN KEY (id_producto) REFERENCES productos(id)
+        ) ENGINE=InnoDB;
+    """
+    for nombre_tabla, query in sorted(tablas.items()):
+        cursor.execute(query)
+
+def _metodo_pago_varchar(cursor, db_name):
+    # Versiones antiguas tenían otro tipo en metodo_pago; solo se altera (y se reconstruye la tabla) si hace falta.
+    cursor.execute(
+        "SELECT COLUMN_TYPE, COLUMN_DEFAULT FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'ventas' AND COLUMN_NAME = 'metodo_pago'",
+        (db_name,)
+    )
+    fila = cursor.fetchone()
+    if not fila or fila[0].lower() != 'varchar(50)' or (fila[1] or '').strip("'") != 'Efectivo':
+        cursor.execute("ALTER TABLE ventas MODIFY COLUMN metodo_pago VARCHAR(50) DEFAULT 'Efectivo'")
+
+def _columnas_pago_y_fecha(cursor, db_name):
+    for columna, definicion in (('pago_con', "DECIMAL(10,2) DEFAULT 0.00"), ('vuelto', "DECIMAL(10,2) DEFAULT 0.00"),
+                                ('fecha_venta', "DATETIME DEFAULT CURRENT_TIMESTAMP")):
+        cursor.execute(f"SHOW COLUMNS FROM ventas LIKE '{columna}'")
+        if not cursor.fetchone():
+            cursor.execute(f"ALTER TABLE ventas ADD COLUMN {columna} {definicion}")
+
+def _nombres_sin_mayusculas(cursor, db_name):
+    # Los nombres de rubro, familia, marca y valores de atributos son únicos sin distinguir mayúsculas.
+    # Bases creadas con una intercalación binaria o sensible a mayúsculas se pasan a una insensible.
+    for tabla, columna in (('rubro', 'nombre'), ('familia', 'nombre'), ('marca', 'nombre'), ('valores_atributos', 'valor')):
+        cursor.execute(
+            "SELECT COLLATION_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (db_name, tabla, columna)
+        )
+        fila = cursor.fetchone()
+        if fila and fila[0] and (fila[0].endswith('_bin') or '_cs' in fila[0]):
+            # Falla si ya hay valores que solo difieren en mayúsculas; hay que unificarlos a mano y volver a iniciar.
+            cursor.execute(f"ALTER TABLE {tabla} MODIFY {columna} VARCHAR(50) COLLATE utf8mb4_unicode_ci NOT NULL")
+
+def _proyeccion_busqueda(cursor, db_name):
+    # Proyección de `productos` con los nombres de rubro, familia, marca y atributos ya resueltos,
+    # para que la búsqueda avanzada filtre sin unir seis tablas. Se mantiene con `refrescar_productos_busqueda`.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS productos_busqueda (
+            producto_id INT PRIMARY KEY,
+            rubro_id INT,
+            rubro_nombre VARCHAR(50),
+            familia_id INT,
+            familia_nombre VARCHAR(50),
+            marca_id INT,
+            marca_nombre VARCHAR(50),
+            atributo_1_id INT,
+            atributo_1_valor VARCHAR(50),
+            atributo_2_id INT,
+            atributo_2_valor VARCHAR(50),
+            INDEX idx_pb_rubro_familia_marca (rubro_nombre, familia_nombre, marca_nombre),
+            INDEX idx_pb_familia_marca (familia_nombre, marca_nombre),
+            INDEX idx_pb_marca (marca_nombre),
+            INDEX idx_pb_atributo_1 (atributo_1_valor),
+            INDEX idx_pb_atributo_2 (atributo_2_valor),
+            FOREIGN KEY (producto_id) REFERENCES productos(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB;
+    """)
+    refrescar_productos_busqueda(cursor)
+
+def _indices_consultas(cursor, db_name):
+    indices = [
+        # Paginación por clave (nombre, id) del listado de inventario
+        ('productos', 'idx_productos_nombre_id', ('nombre', 'id'), "INDEX"),
+        # Modo de búsqueda `fulltext` de la búsqueda avanzada
+        ('productos', 'ft_productos_nombre', ('nombre',), "FULLTEXT INDEX"),
+        # Reportes: rango de fechas de las ventas, y el detalle de cada venta (la migración 8 lo completa)
+        ('ventas', 'idx_ventas_fecha_id', ('fecha_venta', 'id'), "INDEX"),
+        ('detalle_ventas', 'idx_detalle_venta_cubriente', ('id_venta', 'id_producto', 'cantidad', 'subtotal'), "INDEX"),
+    ]
+    for tabla, nombre, columnas, tipo in indices:
+        asegurar_indice(cursor, tabla, nombre, columnas, tipo)
+
+def _resumen_diario(cursor, db_name):
+    # Totales por día comercial y método de pago, mantenidos al guardar cada venta
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_diario (
+            fecha_comercial DATE NOT NULL,
+            metodo_pago VARCHAR(50) NOT NULL,
+            tickets INT NOT NULL DEFAULT 0,
+            unidades INT NOT NULL DEFAULT 0,
+            bruto DECIMAL(12,2) NOT NULL DEFAULT 0.00,
+            PRIMARY KEY (fecha_comercial, metodo_pago)
+        ) ENGINE=InnoDB;
+    """)
+    reconstruir_resumen_diario(cursor)
+
+def _detalle_ventas_cubriente(cursor, db_name):
+    # QUERY_DETALLE_VENTAS (reportes.py) también lee precio_unitario: con él en el índice,
+    # el detalle de cada venta sale del índice sin leer las filas de detalle_ventas.
+    asegurar_indice(cursor, 'detalle_ventas', 'idx_detalle_venta_cubriente',
+                    ('id_venta', 'id_producto', 'cantidad', 'precio_unitario', 'subtotal'))
+
+def _resumen_bruto_por_detalle(cursor, db_name):
+    # El bruto pasó de ventas.total (con recargo) a la suma de detalle_ventas.subtotal,
+    # la misma base que los totales de la exportación: se recalculan las filas existentes.
+    reconstruir_resumen_diario(cursor)
+
+# (versión, descripción, función(cursor, db_name)), en orden de versión
+MIGRACIONES = [
+    (1, "Tablas iniciales", _tablas_iniciales),
+    (2, "ventas.metodo_pago como VARCHAR(50)", _metodo_pago_varchar),
+    (3, "Columnas pago_con, vuelto y fecha_venta en ventas", _columnas_pago_y_fecha),
+    (4, "Nombres de referencia sin distinguir mayúsculas", _nombres_sin_mayusculas),
+    (5, "Proyección productos_busqueda", _proyeccion_busqueda),
+    (6, "Índices de listado, búsqueda y reportes", _indices_consultas),
+    (7, "Resumen diario de ventas", _resumen_diario),
+    (8, "precio_unitario en el índice cubriente de detalle_ventas", _detalle_ventas_cubriente),
+    (9, "Bruto de resumen_diario desde detalle_ventas.subtotal", _resumen_bruto_por_detalle),
+]
+
+def version_actual(cursor):
+    """Última versión aplicada (0 si la base todavía no tiene `schema_version`)."""
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        return 0
+    return cursor.fetchone()[0] or 0
+
+def aplicar_migraciones(conexion, db_name):
+    """
+    Ejecuta las migraciones pendientes y registra cada una en `schema_version` al terminarla.
+    Si una falla se avisa por consola y se detiene ahí; esa y las siguientes se reintentan en el próximo inicio.
+    Devuelve la lista de versiones aplicadas.
+    """
+    cursor = conexion.cursor()
+    try:
+        actual = version_actual(cursor)
+        pendientes = [migracion for migracion in MIGRACIONES if migracion[0] > actual]
+        if not pendientes:
+            return []
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                descripcion VARCHAR(100) NOT NULL,
+                aplicada DATETIME DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB;
+        """)
+        aplicadas = []
+        for version, descripcion, migrar in pendientes:
+            print(f"🔧 Migración {version}: {descripcion}...")
+            try:
+                migrar(cursor, db_name)
+                cursor.execute("INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)", (version, descripcion))
+                conexion.commit()
+            except mysql.connector.Error as err:
+                conexion.rollback()
+                print(f"⚠️ No se pudo aplicar la migración {version} ({descripcion}): {err}")
+                break
+            aplicadas.append(version)
+        return aplicadas
+    finally:
+        cursor.close()
+
+def inicializar_base_datos(config_db):
+    """
+    Prepara la base de datos al iniciar: usa una conexión del pool de la aplicación (que queda abierta
+    para las siguientes consultas), crea la base si no existe y aplica las migraciones pendientes.
+    En el caso habitual, sin migraciones nuevas, es una sola lectura de `schema_version`.
+    Lanza `mysql.connector.Error` si no puede conectarse al servidor.
+    """
+    db_name = config_db['database']
+    pool = obtener_pool(config_db)
+    try:
+        conexion = pool.obtener()
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_BAD_DB_ERROR:
+            raise
+        # Primera ejecución: la base no existe. Se crea con una conexión solo al servidor.
+        config_servidor = {clave: valor for clave, valor in config_db.items() if clave != 'database'}
+        conexion_servidor = mysql.connector.connect(**config_servidor)
+        try:
+            conexion_servidor.cursor().execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
+        finally:
+            conexion_servidor.close()
+        conexion = pool.obtener()
+
+    try:
+        aplicadas = aplicar_migraciones(conexion, db_name)
+    finally:
+        pool.devolver(conexion)
+    if aplicadas:
+        print(f"🚀 Base de datos actualizada a la versión {aplicadas[-1]}.")
+    return aplicadas
@@ -26,8 +26,9 @@ class DefinicionAtributos:
         self.label_atributo_2 = label_atributo_2
 
 class ProductoSKU:
-    def __init__(self, db_config, familia_id, marca_id, atributo_1_id, atributo_2_id):
+    def __init__(self, db_config, familia_id, marca_id, atributo_1_id, atributo_2_id, rubro_id=None):
         self.db = Database(db_config)
+        self.rubro_id = rubro_id # Si se conoce (p. ej. desde la caché de referencias) no se consulta la BD
         self.familia_id = familia_id
         self.marca_id = marca_id
         self.atributo_1_id = atributo_1_id
@@ -35,7 +36,7 @@ class ProductoSKU:
         self.sku = None # Se generará antes de guardar
 
     def generar_sku(self):
-        rubro_id = self.db.obtener_rubro_id_por_familia(self.familia_id)
+        rubro_id = self.rubro_id if self.rubro_id is not None else self.db.obtener_rubro_id_por_familia(self.familia_id)
         
         if rubro_id >= 100 or self.familia_id >= 100 or self.marca_id >= 1000 or self.atributo_1_id >= 100 or self.atributo_2_id >= 1000:
             raise ValueError("ID excede la longitud permitida para la generación de SKU")
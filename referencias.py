@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from database import Database
+
+class TablaReferencia:
+    """Filas (id, nombre) de una tabla chica de referencia, con búsqueda en ambos sentidos."""
+    def __init__(self, filas):
+        self.opciones = sorted(filas, key=lambda fila: fila[1]) # [(id, nombre)] ordenadas por nombre
+        self.por_id = dict(filas)
+        self.por_nombre = {nombre: id_fila for id_fila, nombre in filas}
+        self._por_nombre_minusculas = {nombre.lower(): id_fila for id_fila, nombre in filas}
+
+    def id_de(self, nombre):
+        """Id de la fila con ese nombre; si no hay coincidencia exacta, sin distinguir mayúsculas (como `get_or_create`)."""
+        if not nombre:
+            return None
+        id_fila = self.por_nombre.get(nombre)
+        return id_fila if id_fila is not None else self._por_nombre_minusculas.get(nombre.lower())
+
+    def nombre_de(self, id_fila):
+        return self.por_id.get(id_fila)
+
+    def opciones_con_primero(self, id_primero=1):
+        """Las opciones ordenadas por nombre, pero con la fila `id_primero` (la opción por defecto) adelante."""
+        primera = [fila for fila in self.opciones if fila[0] == id_primero]
+        return primera + [fila for fila in self.opciones if fila[0] != id_primero]
+
+class DatosReferencia:
+    """
+    Caché del proceso con las tablas de referencia del SKU: rubro, familia, marca, valores_atributos
+    y definicion_atributos. Se leen todas juntas con una sola conexión la primera vez que se piden,
+    y se vuelven a leer solo después de `invalidar()` (cuando Gestión de Atributos agrega filas).
+    `version` aumenta en cada recarga: una ventana abierta guarda la de sus listas y las vuelve a
+    llenar cuando `version_vigente()` da otra (ver `cargar_opciones_combobox` en las ventanas).
+    """
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self._lock = threading.RLock()
+        self._cargado = False
+        self.version = 0
+
+    def _cargar(self):
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            rubros = db.fetchall("SELECT id, nombre FROM rubro")
+            familias = db.fetchall("SELECT id, rubro_id, nombre FROM familia")
+            marcas = db.fetchall("SELECT id, nombre FROM marca")
+            valores = db.fetchall("SELECT id, valor FROM valores_atributos")
+            definiciones = db.fetchall("SELECT familia_id, label_atributo_1, label_atributo_2 FROM definicion_atributos")
+        finally:
+            db.disconnect()
+
+        self._rubro = TablaReferencia([(r['id'], r['nombre']) for r in rubros])
+        self._familia = TablaReferencia([(f['id'], f['nombre']) for f in familias])
+        self._marca = TablaReferencia([(m['id'], m['nombre']) for m in marcas])
+        self._valores_atributos = TablaReferencia([(v['id'], v['valor']) for v in valores])
+
+        self._rubro_de_familia = {f['id']: f['rubro_id'] for f in familias}
+        self._familias_por_rubro = {}
+        for id_familia, nombre in self._familia.opciones: # Ya ordenadas por nombre
+            self._familias_por_rubro.setdefault(self._rubro_de_familia[id_familia], []).append((id_familia, nombre))
+        self._etiquetas = {d['familia_id']: (d['label_atributo_1'], d['label_atributo_2']) for d in definiciones}
+
+        self._cargado = True
+        self.version += 1
+
+    def _asegurar_cargado(self):
+        with self._lock:
+            if not self._cargado:
+                self._cargar()
+
+    def version_vigente(self):
+        """Versión de los datos actuales; si se invalidaron, primero los vuelve a leer."""
+        self._asegurar_cargado()
+        return self.version
+
+    def invalidar(self):
+        """Descarta lo cargado; la próxima consulta vuelve a leer las tablas."""
+        with self._lock:
+            self._cargado = False
+
+    @property
+    def rubro(self):
+        self._asegurar_cargado()
+        return self._rubro
+
+    @property
+    def familia(self):
+        self._asegurar_cargado()
+        return self._familia
+
+    @property
+    def marca(self):
+        self._asegurar_cargado()
+        return self._marca
+
+    @property
+    def valores_atributos(self):
+        self._asegurar_cargado()
+        return self._valores_atributos
+
+    def familias_de_rubro(self, rubro_id):
+        """Lista [(id, nombre)] de las familias del rubro, ordenada por nombre."""
+        self._asegurar_cargado()
+        return list(self._familias_por_rubro.get(rubro_id, []))
+
+    def rubro_de_familia(self, familia_id):
+        self._asegurar_cargado()
+        return self._rubro_de_familia.get(familia_id)
+
+    def etiquetas_de_familia(self, familia_id):
+        """Devuelve `(label_atributo_1, label_atributo_2)` de la familia; cada uno puede ser None."""
+        self._asegurar_cargado()
+        return self._etiquetas.get(familia_id, (None, None))
+
+_referencias = {}
+_referencias_lock = threading.Lock()
+
+def obtener_referencias(db_config):
+    """Devuelve la caché de referencias del proceso para esta configuración, creándola la primera vez."""
+    clave = tuple(sorted(db_config.items()))
+    with _referencias_lock:
+        referencias = _referencias.get(clave)
+        if referencias is None:
+            referencias = DatosReferencia(dict(db_config))
+            _referencias[clave] = referencias
+        return referencias
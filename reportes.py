@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import configparser
+import csv
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import mysql.connector
+from openpyxl import Workbook
+from database import Database, HORA_CORTE, reconstruir_resumen_diario
+
+TAM_BLOQUE = 5000 # Filas leídas del servidor por cada fetchmany
+
+# Detalle de ventas de un período, usado por la exportación del cierre de caja.
+QUERY_DETALLE_VENTAS = (
+    "SELECT v.id AS 'Nro Ticket', v.fecha_venta AS 'Fecha Hora', p.codigo_barras AS 'Código', p.nombre AS 'Producto', "
+    "dv.cantidad AS 'Cantidad', dv.precio_unitario AS 'Precio Unit.', dv.subtotal AS 'Subtotal', v.metodo_pago AS 'Método Pago', "
+    "v.pago_con AS 'Pago Con', v.vuelto AS 'Vuelto' "
+    "FROM ventas v JOIN detalle_ventas dv ON v.id = dv.id_venta JOIN productos p ON dv.id_producto = p.id "
+    "WHERE v.fecha_venta BETWEEN %s AND %s ORDER BY v.id DESC"
+)
+
+# Índice que debe usar cada tabla de la consulta (alias -> nombres aceptados)
+INDICES_ESPERADOS = {
+    'v': ('idx_ventas_fecha_id',),
+    'dv': ('idx_detalle_venta_cubriente', 'id_venta'),
+    'p': ('PRIMARY',),
+}
+
+def revisar_plan_ventas(db_config, fecha_inicio, fecha_fin):
+    """
+    Ejecuta EXPLAIN sobre `QUERY_DETALLE_VENTAS` y devuelve `(plan, problemas)`: las filas del plan
+    y una lista de textos describiendo cada tabla que se recorre completa o no usa el índice esperado.
+    """
+    db = Database(db_config)
+    try:
+        db.connect()
+        plan = db.fetchall("EXPLAIN " + QUERY_DETALLE_VENTAS, (fecha_inicio, fecha_fin))
+    finally:
+        db.disconnect()
+
+    problemas = []
+    for fila in plan:
+        alias = fila.get('table')
+        if fila.get('type') == 'ALL':
+            problemas.append(f"La tabla '{alias}' se recorre completa (type=ALL).")
+        esperados = INDICES_ESPERADOS.get(alias)
+        if esperados and fila.get('key') not in esperados:
+            problemas.append(f"La tabla '{alias}' usa el índice {fila.get('key')!r} en lugar de {' o '.join(esperados)}.")
+    return plan, problemas
+
+def inicio_dia_comercial(momento):
+    """Inicio (a las `HORA_CORTE`) del día comercial al que pertenece `momento`."""
+    inicio = momento.replace(hour=HORA_CORTE, minute=0, second=0, microsecond=0)
+    return inicio - timedelta(days=1) if momento.hour < HORA_CORTE else inicio
+
+def rango_dias_comerciales(desde, hasta):
+    """`(inicio, fin)` en fecha y hora que cubren los días comerciales `desde` a `hasta` inclusive."""
+    inicio = datetime.combine(desde, datetime.min.time()).replace(hour=HORA_CORTE)
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time()).replace(hour=HORA_CORTE) - timedelta(seconds=1)
+    return inicio, fin
+
+def resumen_del_dia(db_config, desde, hasta=None):
+    """
+    Totales de `resumen_diario` entre los días comerciales `desde` y `hasta` (por defecto solo `desde`),
+    una fila por método de pago con `metodo_pago`, `tickets`, `unidades` y `bruto`.
+    Lee el rango de la clave primaria: no recorre las ventas.
+    """
+    db = Database(db_config)
+    try:
+        db.connect()
+        return db.fetchall(
+            "SELECT metodo_pago, SUM(tickets) AS tickets, SUM(unidades) AS unidades, SUM(bruto) AS bruto FROM resumen_diario "
+            "WHERE fecha_comercial BETWEEN %s AND %s GROUP BY metodo_pago ORDER BY metodo_pago", (desde, hasta or desde))
+    finally:
+        db.disconnect()
+
+def reconstruir_resumen(db_config, desde=None, hasta=None):
+    """Recalcula y confirma `resumen_diario` entre dos días comerciales (o todo el historial)."""
+    db = Database(db_config)
+    try:
+        db.connect()
+        reconstruir_resumen_diario(db.cursor, desde, hasta)
+        db.connection.commit()
+    except mysql.connector.Error:
+        db.connection.rollback()
+        raise
+    finally:
+        db.disconnect()
+
+def recorrer_detalle_ventas(db_config, fecha_inicio, fecha_fin, tam_bloque=TAM_BLOQUE):
+    """
+    Generador que devuelve primero los nombres de las columnas y después bloques de hasta `tam_bloque`
+    filas (tuplas) de `QUERY_DETALLE_VENTAS`. Usa un cursor sin buffer: el servidor envía las filas a
+    medida que se leen, así el período completo nunca está entero en memoria.
+    """
+    db = Database(db_config)
+    db.connect()
+    cursor = db.connection.cursor(buffered=False)
+    try:
+        cursor.execute(QUERY_DETALLE_VENTAS, (fecha_inicio, fecha_fin))
+        yield [columna[0] for columna in cursor.description]
+        while True:
+            filas = cursor.fetchmany(tam_bloque)
+            if not filas:
+                break
+            yield filas
+    finally:
+        try:
+            db.connection.consume_results() # Si se cortó antes de terminar, descarta lo que quedó sin leer
+            cursor.close()
+        except mysql.connector.Error:
+            pass
+        db.disconnect()
+
+def exportar_excel_ventas(db_config, fecha_inicio, fecha_fin, ruta_guardado):
+    """
+    Escribe el detalle y los resúmenes de ventas en un archivo Excel sin cargar todo en memoria:
+    las filas pasan del cursor a una hoja de openpyxl en modo `write_only`, y los totales por método
+    de pago y el total general se acumulan mientras tanto. Devuelve la cantidad de filas escritas.
+    """
+    libro = Workbook(write_only=True)
+    hoja_detalle = libro.create_sheet('VentasDetallado')
+    totales_por_metodo = {}
+    total_general = Decimal("0.00")
+    cantidad = 0
+
+    bloques = recorrer_detalle_ventas(db_config, fecha_inicio, fecha_fin)
+    columnas = next(bloques)
+    i_subtotal, i_metodo = columnas.index('Subtotal'), columnas.index('Método Pago')
+    hoja_detalle.append(columnas)
+    for filas in bloques:
+        for fila in filas:
+            hoja_detalle.append(fila)
+            subtotal = fila[i_subtotal] or Decimal("0.00")
+            totales_por_metodo[fila[i_metodo]] = totales_por_metodo.get(fila[i_metodo], Decimal("0.00")) + subtotal
+            total_general += subtotal
+        cantidad += len(filas)
+
+    hoja_resumen = libro.create_sheet('ResumenMetodoPago')
+    hoja_resumen.append(['Método Pago', 'Subtotal'])
+    for metodo in sorted(totales_por_metodo, key=lambda m: (m is None, m or "")): # Mismo orden que un groupby
+        hoja_resumen.append([metodo, totales_por_metodo[metodo]])
+
+    hoja_total = libro.create_sheet('TotalGeneral')
+    hoja_total.append(['Total General Vendido'])
+    hoja_total.append([total_general])
+
+    libro.save(ruta_guardado)
+    return cantidad
+
+def exportar_csv_ventas(db_config, fecha_inicio, fecha_fin, ruta_guardado):
+    """
+    Escribe el detalle de ventas en un CSV (UTF-8, separado por comas) a medida que llegan los bloques
+    del cursor. Es la opción más rápida; no incluye hojas de resumen. Devuelve la cantidad de filas.
+    """
+    cantidad = 0
+    bloques = recorrer_detalle_ventas(db_config, fecha_inicio, fecha_fin)
+    with open(ruta_guardado, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(next(bloques))
+        for filas in bloques:
+            escritor.writerows(filas)
+            cantidad += len(filas)
+    return cantidad
+
+def exportar_parquet_ventas(db_config, fecha_inicio, fecha_fin, ruta_guardado):
+    """
+    Escribe el detalle de ventas en un archivo Parquet, un grupo de filas por cada bloque del cursor.
+    Los importes se guardan como decimales exactos. Necesita `pyarrow`. Devuelve la cantidad de filas.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Para exportar a Parquet instale pyarrow: pip install pyarrow")
+
+    importe = pa.decimal128(10, 2)
+    tipos = {
+        'Nro Ticket': pa.int64(), 'Fecha Hora': pa.timestamp('s'), 'Código': pa.string(), 'Producto': pa.string(),
+        'Cantidad': pa.int64(), 'Precio Unit.': importe, 'Subtotal': importe, 'Método Pago': pa.string(),
+        'Pago Con': importe, 'Vuelto': importe,
+    }
+
+    cantidad = 0
+    bloques = recorrer_detalle_ventas(db_config, fecha_inicio, fecha_fin)
+    esquema = pa.schema([(columna, tipos.get(columna, pa.string())) for columna in next(bloques)])
+    with pq.ParquetWriter(ruta_guardado, esquema) as escritor:
+        for filas in bloques:
+            valores = list(zip(*filas))
+            escritor.write_table(pa.Table.from_arrays([pa.array(col, type=campo.type) for col, campo in zip(valores, esquema)], schema=esquema))
+            cantidad += len(filas)
+    return cantidad
+
+# Formatos de exportación: clave -> (descripción, extensión, función(db_config, inicio, fin, ruta))
+FORMATOS_EXPORTACION = {
+    'xlsx': ("Excel", ".xlsx", exportar_excel_ventas),
+    'csv': ("CSV", ".csv", exportar_csv_ventas),
+    'parquet': ("Parquet", ".parquet", exportar_parquet_ventas),
+}
+
+def _leer_config_db(ruta='config.ini'):
+    config = configparser.ConfigParser()
+    config.read(ruta)
+    db_conf = dict(config['mysql'])
+    db_conf['port'] = int(db_conf['port'])
+    return db_conf
+
+if __name__ == "__main__":
+    # Uso: python reportes.py  -> muestra el plan de la exportación del último día y sale con código 1 si empeoró.
+    #      python reportes.py --reconstruir-resumen [--desde AAAA-MM-DD --hasta AAAA-MM-DD]  -> recalcula resumen_diario.
+    parser = argparse.ArgumentParser(description="Herramientas de reportes de ventas.")
+    parser.add_argument('--reconstruir-resumen', action='store_true', help="Recalcula resumen_diario desde las ventas guardadas.")
+    parser.add_argument('--desde', type=date.fromisoformat, help="Primer día comercial a recalcular (por defecto, todo el historial).")
+    parser.add_argument('--hasta', type=date.fromisoformat, help="Último día comercial a recalcular (por defecto, igual a --desde).")
+    args = parser.parse_args()
+    if args.hasta and not args.desde:
+        parser.error("--hasta requiere --desde (sin fechas se reconstruye todo el historial).")
+
+    if args.reconstruir_resumen:
+        hasta = args.hasta or args.desde
+        reconstruir_resumen(_leer_config_db(), args.desde, hasta)
+        print(f"✅ Resumen diario reconstruido ({f'{args.desde} a {hasta}' if args.desde else 'todo el historial'}).")
+        sys.exit(0)
+
+    fin = datetime.now()
+    plan, problemas = revisar_plan_ventas(_leer_config_db(), fin - timedelta(days=1), fin)
+    for fila in plan:
+        print(f"{fila.get('table')}: type={fila.get('type')} key={fila.get('key')} rows={fila.get('rows')} extra={fila.get('Extra')}")
+    for problema in problemas:
+        print(f"⚠️ {problema}")
+    sys.exit(1 if problemas else 0)
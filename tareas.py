@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class Tarea:
+    """
+    Representa un trabajo enviado al `EjecutorTareas`.
+    Si se cancela antes de terminar, su resultado se descarta y los callbacks no se ejecutan.
+    """
+    def __init__(self, canal=None):
+        self.canal = canal
+        self.cancelada = False
+        self.futuro = None
+
+    def cancelar(self):
+        self.cancelada = True
+        if self.futuro is not None:
+            self.futuro.cancel()
+
+class EjecutorTareas:
+    """
+    Ejecuta las consultas a la base de datos (y otros trabajos lentos) fuera del hilo de Tkinter.
+    Los resultados vuelven al hilo de la interfaz mediante `root.after`, donde se llaman los callbacks.
+
+    Las tareas enviadas a un mismo `canal` se ejecutan de a una y sus callbacks se entregan en el
+    mismo orden en que se enviaron; mientras el callback de un canal está en curso (por ejemplo,
+    esperando un diálogo modal) los siguientes resultados de ese canal quedan retenidos.
+    """
+    INTERVALO_MS = 20
+
+    def __init__(self, root, max_hilos=4):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="tareas")
+        self._canales = {}
+        self._resultados = queue.Queue()
+        self._pendientes = {}
+        self._canales_ocupados = set()
+        self._activo = True
+        self.root.after(self.INTERVALO_MS, self._despachar)
+
+    def _ejecutor_de(self, canal):
+        if canal is None:
+            return self._pool
+        ejecutor = self._canales.get(canal)
+        if ejecutor is None:
+            ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"canal-{canal}")
+            self._canales[canal] = ejecutor
+        return ejecutor
+
+    def enviar(self, funcion, *args, al_terminar=None, al_fallar=None, canal=None):
+        """
+        Ejecuta `funcion(*args)` en segundo plano y devuelve la `Tarea` correspondiente.
+        - `al_terminar(resultado)`: se llama en el hilo de la interfaz si la función termina bien.
+        - `al_fallar(error)`: se llama en el hilo de la interfaz si la función lanza una excepción.
+        - `canal`: nombre de la cola serial a usar cuando importa el orden (p. ej. los escaneos).
+        """
+        tarea = Tarea(canal)
+        tarea.futuro = self._ejecutor_de(canal).submit(self._ejecutar, tarea, funcion, args, al_terminar, al_fallar)
+        return tarea
+
+    def llamar_en_ui(self, funcion, *args):
+        """Programa `funcion(*args)` en el hilo de la interfaz. Se puede llamar desde cualquier hilo."""
+        self._resultados.put((None, funcion, args))
+
+    def _ejecutar(self, tarea, funcion, args, al_terminar, al_fallar):
+        if tarea.cancelada:
+            return
+        try:
+            resultado = funcion(*args)
+        except Exception as e:
+            if al_fallar is None:
+                traceback.print_exc()
+            self._resultados.put((tarea, al_fallar, (e,)))
+        else:
+            self._resultados.put((tarea, al_terminar, (resultado,)))
+
+    def _despachar(self):
+        """Entrega en el hilo de Tkinter los resultados que dejaron los hilos de trabajo."""
+        if not self._activo:
+            return
+        # Se reprograma antes de llamar a los callbacks para que un diálogo modal no detenga
+        # la entrega de resultados de los demás canales.
+        self.root.after(self.INTERVALO_MS, self._despachar)
+
+        while True:
+            try:
+                tarea, callback, args = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            canal = tarea.canal if tarea else None
+            self._pendientes.setdefault(canal, deque()).append((tarea, callback, args))
+
+        for canal, cola in list(self._pendientes.items()):
+            while cola and canal not in self._canales_ocupados:
+                tarea, callback, args = cola.popleft()
+                if callback is None or (tarea is not None and tarea.cancelada):
+                    continue
+                if canal is not None:
+                    self._canales_ocupados.add(canal)
+                try:
+                    callback(*args)
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    self._canales_ocupados.discard(canal)
+
+    def cerrar(self):
+        """Detiene la entrega de resultados y libera los hilos de trabajo."""
+        self._activo = False
+        self._pool.shutdown(wait=False)
+        for ejecutor in self._canales.values():
+            ejecutor.shutdown(wait=False)
+
+def obtener_ejecutor(widget):
+    """Devuelve el ejecutor asociado a la ventana raíz de `widget`, creándolo la primera vez."""
+    root = widget._root()
+    ejecutor = getattr(root, '_ejecutor_tareas', None)
+    if ejecutor is None:
+        ejecutor = EjecutorTareas(root)
+        root._ejecutor_tareas = ejecutor
+    return ejecutor
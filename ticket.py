@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from PIL import Image
+
+ANCHO_LOGO = 370 # Ancho en puntos del logo impreso (papel de 58 mm)
+
+# Comandos ESC/POS
+CMD_INIT = b'\x1b@'
+CMD_CENTER = b'\x1b\x61\x01'
+CMD_LEFT = b'\x1b\x61\x00'
+CMD_CUT = b'\x1d\x56\x00'
+
+_logos = {}
+_logos_lock = threading.Lock()
+
+def _rasterizar(ruta_absoluta, ancho):
+    """Convierte la imagen al comando ESC/POS `GS v 0` (imagen de bits en modo raster)."""
+    img = Image.open(ruta_absoluta)
+    alto = int(ancho * img.size[1] / img.size[0])
+    img = img.resize((ancho, alto), Image.LANCZOS).convert("1")
+
+    # En el modo "1" de PIL un bit encendido es un punto blanco; la impresora imprime los bits
+    # encendidos, así que se invierte antes de empaquetar. Los bits de relleno al final de cada
+    # fila quedan en 0 (sin imprimir), igual que en el formato ESC/POS.
+    img = img.convert("L").point(lambda v: 255 - v).convert("1", dither=Image.NONE)
+    datos_imagen = img.tobytes() # PIL ya empaqueta 8 puntos por byte, fila por fila
+
+    ancho_bytes = (img.width + 7) // 8
+    return (b'\x1d\x76\x30\x00'
+            + ancho_bytes.to_bytes(2, 'little')
+            + img.height.to_bytes(2, 'little')
+            + datos_imagen)
+
+def rasterizar_logo(ruta_absoluta, ancho=ANCHO_LOGO, directorio_cache="cache"):
+    """
+    Devuelve el comando ESC/POS del logo, calculándolo una sola vez.
+    El resultado se guarda en memoria y en `directorio_cache`, con una clave que incluye la fecha de
+    modificación de la imagen y el ancho: si se reemplaza el logo, se vuelve a generar solo.
+    """
+    mtime = os.stat(ruta_absoluta).st_mtime_ns
+    clave = (ruta_absoluta, mtime, ancho)
+    with _logos_lock:
+        comando = _logos.get(clave)
+    if comando is not None:
+        return comando
+
+    nombre_base = os.path.splitext(os.path.basename(ruta_absoluta))[0]
+    ruta_cache = os.path.join(directorio_cache, f"{nombre_base}_{ancho}_{mtime}.escpos")
+    try:
+        with open(ruta_cache, "rb") as f:
+            comando = f.read()
+    except OSError:
+        comando = _rasterizar(ruta_absoluta, ancho)
+        try:
+            os.makedirs(directorio_cache, exist_ok=True)
+            temporal = ruta_cache + ".tmp"
+            with open(temporal, "wb") as f:
+                f.write(comando)
+            os.replace(temporal, ruta_cache)
+        except OSError as e:
+            print(f"No se pudo guardar el logo del ticket en caché: {e}")
+
+    with _logos_lock:
+        _logos[clave] = comando
+    return comando
+
+class PlantillaTicket:
+    """
+    Plantilla del ticket de venta. Las partes fijas (logo, dirección, separadores y pie) se codifican
+    una sola vez al crearla; en cada venta solo se escriben las líneas variables sobre un `bytearray`.
+    La misma plantilla genera los bytes ESC/POS para la impresora y una vista previa en texto plano.
+    """
+    def __init__(self, encabezado, pie="GRACIAS POR SU COMPRA", logo=b"", ancho=32, codificacion="latin-1"):
+        """
+        - `encabezado`: Líneas centradas con los datos del local.
+        - `pie`: Mensaje centrado al final del ticket.
+        - `logo`: Comando ESC/POS del logo (ver `rasterizar_logo`), o vacío.
+        - `ancho`: Caracteres por línea del papel.
+        """
+        self.ancho = ancho
+        self.codificacion = codificacion
+
+        separador = "-" * ancho + "\n"
+        self._separador = separador.encode(codificacion)
+        self._cabecera = ((logo + b"\n") if logo else b"") + CMD_INIT + CMD_CENTER \
+            + "".join(f"{linea}\n" for linea in encabezado).encode(codificacion) + CMD_LEFT + self._separador
+        self._cierre = b"\n" + CMD_CENTER + f"{pie}\n\n\n".encode(codificacion) + CMD_CUT
+
+        self._texto_cabecera = "".join(f"{linea.center(ancho)}\n" for linea in encabezado) + separador
+        self._texto_separador = separador
+        self._texto_cierre = f"\n{pie.center(ancho)}\n"
+
+    def _texto_linea(self, linea):
+        nombre = linea.nombre[:self.ancho].upper()
+        return f"{nombre}\n{linea.cantidad} x ${linea.precio:.2f}    ${linea.subtotal:.2f}\n"
+
+    def renderizar(self, id_venta, fecha, lineas, total, pago, vuelto):
+        """Devuelve los bytes ESC/POS del ticket."""
+        cod = self.codificacion
+        buffer = bytearray(self._cabecera)
+        buffer += f"Fecha: {fecha.strftime('%d/%m/%Y %H:%M')}\nTicket Nro: {id_venta}\n".encode(cod)
+        buffer += self._separador
+        for linea in lineas:
+            buffer += self._texto_linea(linea).encode(cod, errors="replace")
+        buffer += self._separador
+        buffer += CMD_CENTER
+        buffer += f"TOTAL: ${total:.2f}\n".encode(cod)
+        buffer += CMD_LEFT
+        buffer += f"PAGO:   ${pago:.2f}\nVUELTO: ${vuelto:.2f}\n".encode(cod)
+        buffer += self._cierre
+        return bytes(buffer)
+
+    def renderizar_texto(self, id_venta, fecha, lineas, total, pago, vuelto):
+        """Devuelve el mismo ticket como texto plano, para mostrarlo en pantalla."""
+        partes = [self._texto_cabecera, f"Fecha: {fecha.strftime('%d/%m/%Y %H:%M')}\nTicket Nro: {id_venta}\n", self._texto_separador]
+        partes.extend(self._texto_linea(linea) for linea in lineas)
+        partes.append(self._texto_separador)
+        partes.append(f"{f'TOTAL: ${total:.2f}'.center(self.ancho)}\n")
+        partes.append(f"PAGO:   ${pago:.2f}\nVUELTO: ${vuelto:.2f}\n")
+        partes.append(self._texto_cierre)
+        return "".join(partes)
@@ -1,16 +1,30 @@
 # -*- coding: utf-8 -*-
 
+import re
 import tkinter as tk
 from tkinter import ttk, messagebox
-import mysql.connector
 from database import Database
+from tareas import obtener_ejecutor
+from indice_busqueda import obtener_indice
+from referencias import obtener_referencias
 from windows.searchable_combobox import SearchableCombobox
 
 class VentanaBusquedaProducto:
     """
     Ventana emergente para buscar productos por nombre y/o atributos de SKU y agregarlos al carrito.
+
+    El texto se busca de una de dos formas, según `modo` (sección [busqueda] de config.ini):
+    - `trigramas` (por defecto): índice de trigramas en memoria, tolerante a errores de tipeo.
+    - `fulltext`: índice FULLTEXT de MySQL sobre `productos.nombre`, sin cargar el catálogo en memoria.
+
+    Cada búsqueda trae como máximo `max_resultados` productos; el resto se pide con "Cargar más".
+    Las filas se insertan en la tabla de a bloques, para que la ventana siga respondiendo.
     """
-    def __init__(self, master, db_config, callback_agregar):
+    TAM_BLOQUE = 50 # Filas insertadas en la tabla por cada llamada de `after`
+    TAM_LOTE_IDS = 500 # Ids del índice de trigramas por consulta, para no armar sentencias enormes
+    LARGO_MINIMO_FULLTEXT = 3 # innodb_ft_min_token_size por defecto; las palabras más cortas no se indexan
+
+    def __init__(self, master, db_config, callback_agregar, modo="trigramas", max_resultados=500):
         self.top = tk.Toplevel(master)
         self.top.title("Búsqueda Avanzada de Producto")
         self.top.geometry("1000x700")
@@ -18,6 +32,12 @@ class VentanaBusquedaProducto:
 
         self.db_config = db_config
         self.callback_agregar = callback_agregar
+        self.modo = modo
+        self.max_resultados = max_resultados
+        self.productos_filtrados = []
+        self.tarea_filtro = None # Búsqueda en curso, se descarta si se lanza otra.
+        self.consulta_actual = None # Argumentos de la última búsqueda, para "Cargar más"
+        self.insercion_programada = None # `after` que inserta el siguiente bloque de filas
         
         # --- Variables de SKU ---
         self.var_rubro = tk.StringVar()
@@ -102,56 +122,71 @@ class VentanaBusquedaProducto:
         scrollbar.pack(side="right", fill="y")
         self.tree.configure(yscrollcommand=scrollbar.set)
         
+        # --- Cantidad de resultados y "Cargar más" ---
+        frame_resultados = tk.Frame(self.top)
+        frame_resultados.pack(fill="x", padx=10)
+        self.lbl_resultados = tk.Label(frame_resultados, text="", font=("Segoe UI", 10))
+        self.lbl_resultados.pack(side="left")
+        self.btn_cargar_mas = tk.Button(frame_resultados, text="⬇ Cargar más", font=("Segoe UI", 10), state="disabled", command=self.cargar_mas)
+        self.btn_cargar_mas.pack(side="right")
+
         # --- Botón de Agregar ---
         btn_frame = tk.Frame(self.top, pady=10)
         btn_frame.pack(fill="x")
         tk.Button(btn_frame, text="✔ Agregar Producto Seleccionado", bg="#28a745", fg="white", font=("Segoe UI", 12, "bold"), command=self.seleccionar_y_cerrar).pack(ipadx=10, ipady=5)
 
-    def _get_db_options(self, table_name, value_column_name='nombre'):
-        """Helper para obtener opciones de una tabla simple (id, nombre/valor)."""
-        options = []
+    def _get_db_options(self, table_name):
+        """Opciones (id, nombre/valor) de una tabla de referencia, ordenadas. Salen de la caché compartida."""
         try:
-            db = Database(self.db_config)
-            db.connect()
-            db.cursor.execute(f"SELECT id, {value_column_name} FROM {table_name} ORDER BY {value_column_name}")
-            for row in db.cursor.fetchall():
-                options.append((row['id'], row[value_column_name]))
-            db.disconnect()
+            return getattr(obtener_referencias(self.db_config), table_name).opciones
         except Exception as e:
             messagebox.showerror("Error de BD", f"No se pudieron cargar las opciones para {table_name}: {e}")
-        return options
+            return []
 
     def cargar_opciones_combobox(self):
         """Carga las opciones iniciales para los filtros."""
+        self._poblar_opciones()
+        self.limpiar_filtros()
+        # Si otra ventana agrega rubros, marcas o valores mientras esta sigue abierta, las listas se
+        # actualizan al volver a ella (sin tocar los filtros elegidos).
+        self.top.bind("<FocusIn>", self._refrescar_opciones, add="+")
+
+    def _refrescar_opciones(self, event=None):
+        try:
+            referencias = obtener_referencias(self.db_config)
+            if referencias.version_vigente() == self.version_referencias:
+                return
+            self._poblar_opciones()
+            rubro_id = referencias.rubro.id_de(self.var_rubro.get())
+            self.familias = referencias.familias_de_rubro(rubro_id) if rubro_id else []
+            self.combo_familia['values'] = [""] + [f[1] for f in self.familias]
+        except Exception as e:
+            print(f"No se pudieron actualizar las opciones: {e}")
+
+    def _poblar_opciones(self):
+        """Llena las listas de los filtros desde la caché y recuerda su versión."""
         self.rubros = self._get_db_options("rubro")
         self.combo_rubro['values'] = [""] + [r[1] for r in self.rubros]
 
         self.marcas = self._get_db_options("marca")
         self.combo_marca.values = [""] + [m[1] for m in self.marcas]
 
-        self.valores_atributos = self._get_db_options("valores_atributos", "valor")
+        self.valores_atributos = self._get_db_options("valores_atributos")
         attr_values = [""] + [v[1] for v in self.valores_atributos]
         self.combo_atributo_1.values = attr_values
         self.combo_atributo_2.values = attr_values
-        
-        self.limpiar_filtros()
+        self.version_referencias = obtener_referencias(self.db_config).version
 
     def cargar_familias_por_rubro(self, event=None):
         """Carga las familias según el rubro seleccionado."""
-        rubro_seleccionado_nombre = self.var_rubro.get()
-        rubro_id = next((r[0] for r in self.rubros if r[1] == rubro_seleccionado_nombre), None)
-        
+        referencias = obtener_referencias(self.db_config)
         self.familias = []
-        if rubro_id:
-            try:
-                db = Database(self.db_config)
-                db.connect()
-                db.cursor.execute("SELECT id, nombre FROM familia WHERE rubro_id = %s ORDER BY nombre", (rubro_id,))
-                for row in db.cursor.fetchall():
-                    self.familias.append((row['id'], row['nombre']))
-                db.disconnect()
-            except Exception as e:
-                messagebox.showerror("Error de BD", f"No se pudieron cargar las familias: {e}")
+        try:
+            rubro_id = referencias.rubro.id_de(self.var_rubro.get())
+            if rubro_id:
+                self.familias = referencias.familias_de_rubro(rubro_id)
+        except Exception as e:
+            messagebox.showerror("Error de BD", f"No se pudieron cargar las familias: {e}")
         
         self.combo_familia['values'] = [""] + [f[1] for f in self.familias]
         self.var_familia.set("")
@@ -169,63 +204,189 @@ class VentanaBusquedaProducto:
     def filtrar_productos(self):
         """Construye una consulta SQL basada en los filtros y actualiza el Treeview."""
         # Limpiar resultados anteriores
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self._cancelar_insercion()
+        self.tree.delete(*self.tree.get_children())
+        self.productos_filtrados = []
+        self.btn_cargar_mas.config(state="disabled")
 
-        # Construcción de la consulta SQL
+        # Construcción de la consulta SQL. Los nombres de rubro, familia, marca y atributos se filtran
+        # sobre la proyección `productos_busqueda`, que ya los tiene resueltos e indexados.
         base_query = """
             SELECT p.id, p.codigo_barras, p.nombre, p.precio_venta, p.stock_actual, p.tipo, p.sku
             FROM productos p
-            LEFT JOIN producto_sku ps ON p.sku = ps.sku
-            LEFT JOIN familia f ON ps.familia_id = f.id
-            LEFT JOIN rubro r ON f.rubro_id = r.id
-            LEFT JOIN marca m ON ps.marca_id = m.id
-            LEFT JOIN valores_atributos va1 ON ps.atributo_1_id = va1.id
-            LEFT JOIN valores_atributos va2 ON ps.atributo_2_id = va2.id
+            LEFT JOIN productos_busqueda pb ON pb.producto_id = p.id
         """
         conditions = []
         params = []
 
-        # Filtro por texto (nombre o código de barras)
-        texto_busqueda = self.entry_buscar.get()
-        if texto_busqueda:
-            conditions.append("(p.nombre LIKE %s OR p.codigo_barras LIKE %s)")
-            params.extend([f"%{texto_busqueda}%", f"%{texto_busqueda}%"])
+        # El filtro por texto (nombre, código de barras o SKU) se resuelve en segundo plano
+        # en `_consultar_productos`; acá solo se arman los filtros de SKU.
+        texto_busqueda = self.entry_buscar.get().strip()
 
         # Filtros de SKU
         if self.var_rubro.get():
-            conditions.append("r.nombre = %s")
+            conditions.append("pb.rubro_nombre = %s")
             params.append(self.var_rubro.get())
         if self.var_familia.get():
-            conditions.append("f.nombre = %s")
+            conditions.append("pb.familia_nombre = %s")
             params.append(self.var_familia.get())
         if self.combo_marca.get():
-            conditions.append("m.nombre = %s")
+            conditions.append("pb.marca_nombre = %s")
             params.append(self.combo_marca.get())
         if self.combo_atributo_1.get():
-            conditions.append("va1.valor = %s")
+            conditions.append("pb.atributo_1_valor = %s")
             params.append(self.combo_atributo_1.get())
         if self.combo_atributo_2.get():
-            conditions.append("va2.valor = %s")
+            conditions.append("pb.atributo_2_valor = %s")
             params.append(self.combo_atributo_2.get())
 
+        self.consulta_actual = (base_query, conditions, params, texto_busqueda)
+        self._lanzar_consulta(0)
+
+    def cargar_mas(self):
+        """Pide la siguiente tanda de resultados de la última búsqueda."""
+        if self.consulta_actual and not self.tarea_filtro and not self.insercion_programada:
+            self.btn_cargar_mas.config(state="disabled")
+            self._lanzar_consulta(len(self.productos_filtrados))
+
+    def _lanzar_consulta(self, desplazamiento):
+        # La consulta corre en segundo plano; una búsqueda nueva descarta la anterior.
+        if self.tarea_filtro:
+            self.tarea_filtro.cancelar()
+        self.top.config(cursor="watch")
+        self.tarea_filtro = obtener_ejecutor(self.top).enviar(
+            self._consultar_productos, *self.consulta_actual, desplazamiento,
+            al_terminar=self._mostrar_productos, al_fallar=self._error_filtrado
+        )
+
+    def _consultar_productos(self, query, conditions, params, texto_busqueda, desplazamiento=0):
+        """
+        Ejecuta la consulta de filtrado. Se llama fuera del hilo de la interfaz.
+        El texto lo resuelve `_consultar_por_trigramas` o `_filtro_fulltext` según el modo.
+        Trae hasta `max_resultados + 1` filas a partir de `desplazamiento`; la fila de más solo indica
+        que quedan resultados por cargar.
+        """
+        conditions, params = list(conditions), list(params)
+        if texto_busqueda and self.modo != "fulltext":
+            return self._consultar_por_trigramas(query, conditions, params, texto_busqueda, desplazamiento)
+        orden, params_orden = "p.nombre ASC", []
+
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            if texto_busqueda:
+                condicion, params_condicion, orden, params_orden = self._filtro_fulltext(db, texto_busqueda)
+                conditions.append(condicion)
+                params.extend(params_condicion)
+
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += f" ORDER BY {orden} LIMIT %s OFFSET %s"
+            return db.fetchall(query, tuple(params + params_orden + [self.max_resultados + 1, desplazamiento]))
+        finally:
+            db.disconnect()
+
+    def _consultar_por_trigramas(self, query, conditions, params, texto, desplazamiento):
+        """
+        El índice de trigramas da los ids por relevancia (tolerando errores de tipeo) y la consulta trae
+        esos productos de a `TAM_LOTE_IDS`, aplicando los filtros de SKU, hasta juntar la página pedida.
+        Sin filtros la página se corta directamente sobre la lista del índice.
+        """
+        indice = obtener_indice(self.db_config)
+        indice.actualizar() # Antes de tomar la conexión de la consulta: puede leer el catálogo con otra del pool
+
+        necesarios = desplazamiento + self.max_resultados + 1
         if conditions:
-            base_query += " WHERE " + " AND ".join(conditions)
-        
-        base_query += " ORDER BY p.nombre ASC"
+            ids = indice.buscar(texto, None)
+        else:
+            ids = indice.buscar(texto, necesarios)[desplazamiento:]
+            necesarios, desplazamiento = len(ids), 0
+        if not ids:
+            return []
+        posicion = {id_producto: i for i, id_producto in enumerate(ids)}
 
+        filas = []
+        db = Database(self.db_config)
         try:
-            db = Database(self.db_config)
             db.connect()
-            self.productos_filtrados = db.fetchall(base_query, tuple(params))
+            # Los lotes siguen el orden de relevancia: al juntar `necesarios` filas, las primeras ya son las correctas.
+            for inicio in range(0, len(ids), self.TAM_LOTE_IDS):
+                lote = ids[inicio:inicio + self.TAM_LOTE_IDS]
+                marcadores = ", ".join(["%s"] * len(lote))
+                where = " AND ".join(conditions + [f"p.id IN ({marcadores})"])
+                filas.extend(db.fetchall(f"{query} WHERE {where}", tuple(params + lote)))
+                if len(filas) >= necesarios:
+                    break
+        finally:
             db.disconnect()
-            
-            for p in self.productos_filtrados:
-                self.tree.insert("", "end", values=(
-                    p['id'], p['nombre'], f"${p['precio_venta']:.2f}", p['stock_actual'], p.get('sku', '')
-                ))
-        except mysql.connector.Error as err:
-            messagebox.showerror("Error de Búsqueda", f"No se pudieron filtrar los productos: {err}", parent=self.top)
+
+        filas.sort(key=lambda fila: posicion[fila['id']])
+        return filas[desplazamiento:desplazamiento + self.max_resultados + 1]
+
+    def _filtro_fulltext(self, db, texto):
+        """
+        Un código de barras o SKU exacto se resuelve con su índice único. Si no, se busca el nombre
+        con MATCH ... AGAINST en modo booleano (todas las palabras, por prefijo) ordenado por relevancia.
+        El LIMIT lo agrega `_consultar_productos`.
+        Devuelve `(condición, parámetros, orden, parámetros del orden)`.
+        """
+        exacto = db.fetchone("SELECT id FROM productos WHERE codigo_barras = %s", (texto,)) \
+            or db.fetchone("SELECT id FROM productos WHERE sku = %s", (texto,))
+        if exacto:
+            return "p.id = %s", [exacto['id']], "p.nombre ASC", []
+
+        # Se quitan los operadores del modo booleano para que el texto del usuario no los active
+        palabras = [p for p in re.sub(r'[+\-<>()~*"@]', " ", texto).split() if len(p) >= self.LARGO_MINIMO_FULLTEXT]
+        if not palabras:
+            # Solo palabras demasiado cortas para el índice: se busca por comienzo del nombre
+            return "p.nombre LIKE %s", [f"{texto}%"], "p.nombre ASC", []
+        consulta = " ".join(f"+{p}*" for p in palabras)
+        match = "MATCH(p.nombre) AGAINST (%s IN BOOLEAN MODE)"
+        return match, [consulta], f"{match} DESC, p.nombre ASC", [consulta]
+
+    def _mostrar_productos(self, productos):
+        """
+        Agrega al Treeview los productos devueltos por la consulta. El primer bloque se inserta
+        enseguida y el resto de a `TAM_BLOQUE` filas mediante `after`. "Cargar más" se habilita
+        recién cuando terminó la inserción, así una tanda nueva nunca corta a la anterior.
+        """
+        if not self.top.winfo_exists(): return
+        self.top.config(cursor="")
+        self.tarea_filtro = None
+        hay_mas = len(productos) > self.max_resultados
+        productos = productos[:self.max_resultados]
+        self.productos_filtrados.extend(productos)
+
+        texto = f"Mostrando {len(self.productos_filtrados)} productos"
+        self.lbl_resultados.config(text=texto + (" (hay más resultados)" if hay_mas else ""))
+        self.btn_cargar_mas.config(state="disabled")
+        self._insertar_bloque(productos, 0, hay_mas)
+
+    def _insertar_bloque(self, productos, inicio, hay_mas=False):
+        self.insercion_programada = None
+        if not self.top.winfo_exists(): return
+        for p in productos[inicio:inicio + self.TAM_BLOQUE]:
+            self.tree.insert("", "end", values=(
+                p['id'], p['nombre'], f"${p['precio_venta']:.2f}", p['stock_actual'], p.get('sku', '')
+            ))
+        siguiente = inicio + self.TAM_BLOQUE
+        if siguiente < len(productos):
+            self.insercion_programada = self.top.after(1, self._insertar_bloque, productos, siguiente, hay_mas)
+        elif hay_mas:
+            self.btn_cargar_mas.config(state="normal")
+
+    def _cancelar_insercion(self):
+        if self.insercion_programada:
+            self.top.after_cancel(self.insercion_programada)
+            self.insercion_programada = None
+
+    def _error_filtrado(self, err):
+        if not self.top.winfo_exists(): return
+        self.top.config(cursor="")
+        self.tarea_filtro = None
+        if self.consulta_actual and self.productos_filtrados:
+            self.btn_cargar_mas.config(state="normal") # Se puede volver a intentar
+        messagebox.showerror("Error de Búsqueda", f"No se pudieron filtrar los productos: {err}", parent=self.top)
 
     def seleccionar_y_cerrar(self, event=None):
         """Obtiene el producto seleccionado, lo pasa al callback y cierra la ventana."""
@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
+from dinero import CERO, a_dinero, leer_decimal, leer_dinero
 
 class VentanaCobro:
     """
@@ -12,7 +13,7 @@ class VentanaCobro:
         """
         Inicializa la ventana de cobro.
         - `master`: La ventana principal.
-        - `total_a_pagar`: El monto total del carrito que se debe cobrar.
+        - `total_a_pagar`: El monto total del carrito que se debe cobrar (Decimal).
         - `callback_guardar`: La función que se ejecutará al confirmar el pago.
         """
         self.top = tk.Toplevel(master)
@@ -24,8 +25,8 @@ class VentanaCobro:
         BG_COLOR = "#e3e3e3" 
         self.top.config(bg=BG_COLOR)
         
-        self.total_original = total_a_pagar
-        self.total_final = total_a_pagar 
+        self.total_original = a_dinero(total_a_pagar)
+        self.total_final = self.total_original
         self.callback = callback_guardar # Función para guardar la venta en la BD.
         
         # Definición de fuentes para consistencia visual.
@@ -85,7 +86,7 @@ class VentanaCobro:
         self.frame_simple = tk.Frame(self.frame_contenedor_pagos, bg="white", bd=1, relief="solid")
         
         tk.Label(self.frame_simple, text="PAGA CON:", bg="white", fg="#555", font=("Segoe UI", 10, "bold")).pack(anchor="w", padx=10, pady=(10,0))
-        self.var_pago_simple = tk.DoubleVar(value=0.0)
+        self.var_pago_simple = tk.StringVar(value="0.00")
         self.entry_pago_simple = tk.Entry(self.frame_simple, textvariable=self.var_pago_simple, font=self.FONT_INPUT, 
                                           justify="center", bd=0, bg="#f9f9f9")
         self.entry_pago_simple.pack(fill="x", padx=10, pady=5)
@@ -107,7 +108,7 @@ class VentanaCobro:
         self.combo_m1.current(0)
         self.combo_m1.pack(side="left", padx=5, pady=5)
         
-        self.var_monto1 = tk.DoubleVar(value=0.0)
+        self.var_monto1 = tk.StringVar(value="0.00")
         self.entry_monto1 = tk.Entry(f1, textvariable=self.var_monto1, font=self.FONT_INPUT, width=10, justify="right", bd=0)
         self.entry_monto1.pack(side="right", padx=5, pady=5)
         self.entry_monto1.bind("<KeyRelease>", self.calcular_restante_mixto)
@@ -119,7 +120,7 @@ class VentanaCobro:
         self.combo_m2.current(1)
         self.combo_m2.pack(side="left", padx=5, pady=5)
         
-        self.var_monto2 = tk.DoubleVar(value=0.0)
+        self.var_monto2 = tk.StringVar(value="0.00")
         self.entry_monto2 = tk.Entry(f2, textvariable=self.var_monto2, font=self.FONT_INPUT, width=10, justify="right", bd=0)
         self.entry_monto2.pack(side="right", padx=5, pady=5)
         
@@ -177,7 +178,7 @@ class VentanaCobro:
             else:
                 # Para otros métodos (tarjeta, etc.), se autocompleta con el total a pagar.
                 self.entry_pago_simple.config(state="normal")
-                self.var_pago_simple.set(self.total_final)
+                self.var_pago_simple.set(str(self.total_final))
                 self.entry_pago_simple.config(state="disabled", bg="#e3e3e3")
 
     def recalcular_total(self, event=None):
@@ -185,8 +186,8 @@ class VentanaCobro:
         Recalcula el monto total a pagar si se aplica un porcentaje de interés.
         """
         try:
-            porcentaje = float(self.var_porcentaje.get() or "0")
-            monto_recargo = self.total_original * (porcentaje / 100)
+            porcentaje = leer_decimal(self.var_porcentaje.get() or "0")
+            monto_recargo = a_dinero(self.total_original * porcentaje / 100)
             self.total_final = self.total_original + monto_recargo
             
             self.lbl_total_gigante.config(text=f"${self.total_final:.2f}")
@@ -194,7 +195,7 @@ class VentanaCobro:
             
             if self.var_metodo.get() not in ["Efectivo", "Pago Mixto"]:
                  self.entry_pago_simple.config(state="normal")
-                 self.var_pago_simple.set(self.total_final)
+                 self.var_pago_simple.set(str(self.total_final))
                  self.entry_pago_simple.config(state="disabled")
             elif self.var_metodo.get() == "Pago Mixto":
                 self.calcular_restante_mixto()
@@ -205,7 +206,7 @@ class VentanaCobro:
         Calcula y muestra el vuelto en tiempo real para el modo de pago simple.
         """
         try:
-            pago = float(self.entry_pago_simple.get())
+            pago = leer_dinero(self.entry_pago_simple.get())
             vuelto = pago - self.total_final
             if vuelto < 0:
                 self.lbl_vuelto_simple.config(text="Falta dinero", fg="#dc3545")
@@ -219,7 +220,7 @@ class VentanaCobro:
         Calcula automáticamente el segundo monto en el pago mixto basado en el primero.
         """
         try:
-            m1 = float(self.entry_monto1.get() or "0")
+            m1 = leer_dinero(self.entry_monto1.get() or "0")
             resto = self.total_final - m1
             self.var_monto2.set(f"{resto:.2f}")
             
@@ -234,14 +235,15 @@ class VentanaCobro:
     def confirmar_pago(self):
         """
         Valida los montos ingresados y llama a la función de callback para guardar la venta.
+        Los importes son Decimal exactos, por lo que la comparación con el total no necesita tolerancia.
         """
         metodo_guardar = metodo = self.var_metodo.get()
-        pago_final, vuelto_final = 0.0, 0.0
+        pago_final, vuelto_final = CERO, CERO
 
         if metodo == "Pago Mixto":
             try:
-                m1, m2 = self.var_monto1.get(), self.var_monto2.get()
-                if (m1 + m2) < (self.total_final - 0.10):
+                m1, m2 = leer_dinero(self.var_monto1.get() or "0"), leer_dinero(self.var_monto2.get() or "0")
+                if (m1 + m2) < self.total_final:
                     messagebox.showwarning("Error", "Falta cubrir dinero.")
                     return
                 metodo_guardar = f"Mixto: {self.combo_m1.get()}(${m1:.0f}) + {self.combo_m2.get()}(${m2:.0f})"
@@ -251,11 +253,15 @@ class VentanaCobro:
                 messagebox.showerror("Error", "Verifique los montos ingresados")
                 return
         else:
-            pago_final = float(self.entry_pago_simple.get() or self.total_final)
-            if metodo == "Efectivo" and pago_final < (self.total_final - 0.01): 
+            try:
+                pago_final = leer_dinero(self.entry_pago_simple.get() or self.total_final)
+            except ValueError:
+                messagebox.showerror("Error", "Verifique el monto ingresado")
+                return
+            if metodo == "Efectivo" and pago_final < self.total_final: 
                 messagebox.showwarning("Atención", "El pago es insuficiente.")
                 return
             vuelto_final = pago_final - self.total_final
         
         self.top.destroy()
-        self.callback(metodo_guardar, pago_final, max(0, vuelto_final), self.total_final)
+        self.callback(metodo_guardar, pago_final, max(CERO, vuelto_final), self.total_final)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import tkinter as tk
+from tkinter import messagebox, filedialog
+from datetime import date, datetime
+from reportes import FORMATOS_EXPORTACION, inicio_dia_comercial, rango_dias_comerciales, resumen_del_dia
+
+class VentanaExportacionVentas:
+    """
+    Ventana para exportar el detalle de ventas de un rango de días comerciales en Excel, CSV o Parquet.
+    Antes de elegir el archivo muestra los totales del período leídos de `resumen_diario`; la consulta
+    y la escritura del archivo corren en segundo plano.
+    """
+    def __init__(self, master, db_config, ejecutor, formato='xlsx'):
+        """
+        - `master`: La ventana principal.
+        - `db_config`: Configuración de conexión a la base de datos.
+        - `ejecutor`: El `EjecutorTareas` de la aplicación.
+        - `formato`: Clave de `FORMATOS_EXPORTACION` seleccionada al abrir.
+        """
+        self.top = tk.Toplevel(master)
+        self.top.title("Exportar Ventas")
+        self.top.geometry("340x280")
+        self.top.grab_set() # Ventana modal.
+
+        self.db_config = db_config
+        self.ejecutor = ejecutor
+        hoy = inicio_dia_comercial(datetime.now()).date().isoformat()
+        self.var_desde = tk.StringVar(value=hoy)
+        self.var_hasta = tk.StringVar(value=hoy)
+        self.var_formato = tk.StringVar(value=formato if formato in FORMATOS_EXPORTACION else 'xlsx')
+
+        # Rango de días comerciales (cada uno empieza a la hora de corte).
+        frame_fechas = tk.Frame(self.top)
+        frame_fechas.pack(pady=10)
+        tk.Label(frame_fechas, text="Desde (AAAA-MM-DD):").grid(row=0, column=0, sticky="e", padx=5, pady=3)
+        entry_desde = tk.Entry(frame_fechas, textvariable=self.var_desde, width=12, justify="center")
+        entry_desde.grid(row=0, column=1, pady=3)
+        tk.Label(frame_fechas, text="Hasta (AAAA-MM-DD):").grid(row=1, column=0, sticky="e", padx=5, pady=3)
+        tk.Entry(frame_fechas, textvariable=self.var_hasta, width=12, justify="center").grid(row=1, column=1, pady=3)
+
+        # Formato del archivo.
+        frame_formato = tk.LabelFrame(self.top, text="Formato")
+        frame_formato.pack(fill="x", padx=20)
+        for clave, (descripcion, extension, _) in FORMATOS_EXPORTACION.items():
+            tk.Radiobutton(frame_formato, text=f"{descripcion} ({extension})", variable=self.var_formato, value=clave).pack(anchor="w", padx=10)
+
+        self.btn_exportar = tk.Button(self.top, text="Exportar", bg="#217346", fg="white", command=self.exportar)
+        self.btn_exportar.pack(pady=15, fill="x", padx=30)
+        entry_desde.focus_set()
+
+    def exportar(self):
+        """Valida el rango, muestra el resumen del período y, si se confirma, exporta en segundo plano."""
+        try:
+            desde = date.fromisoformat(self.var_desde.get().strip())
+            hasta = date.fromisoformat(self.var_hasta.get().strip())
+        except ValueError:
+            messagebox.showwarning("Atención", "Ingrese las fechas con el formato AAAA-MM-DD.", parent=self.top)
+            return
+        if desde > hasta:
+            messagebox.showwarning("Atención", "La fecha 'Desde' no puede ser posterior a 'Hasta'.", parent=self.top)
+            return
+
+        descripcion, extension, exportar_archivo = FORMATOS_EXPORTACION[self.var_formato.get()]
+        fecha_inicio, fecha_fin = rango_dias_comerciales(desde, hasta)
+
+        def al_fallar(e):
+            if self.top.winfo_exists():
+                self.btn_exportar.config(state="normal")
+            messagebox.showerror("Error de Exportación", f"No se pudo generar el archivo {descripcion}: {e}")
+
+        def al_exportar(cantidad, ruta_guardado):
+            if self.top.winfo_exists():
+                self.btn_exportar.config(state="normal")
+            messagebox.showinfo("Éxito", f"Se exportaron {cantidad} líneas en:\n{ruta_guardado}")
+
+        def al_resumir(resumen):
+            if not self.top.winfo_exists(): return
+            if not resumen:
+                messagebox.showinfo("Sin Datos", "No hay ventas para exportar en el período elegido.", parent=self.top)
+                return
+
+            lineas = [f"{fila['metodo_pago'] or 'Sin método'}: {fila['tickets']} tickets, ${fila['bruto']:.2f}" for fila in resumen]
+            total = sum(fila['bruto'] for fila in resumen)
+            if not messagebox.askokcancel("Cierre de Caja", "\n".join(lineas) + f"\n\nTotal: ${total:.2f}\n\n¿Exportar el detalle a {descripcion}?", parent=self.top):
+                return
+
+            periodo = desde.isoformat() if desde == hasta else f"{desde.isoformat()}_{hasta.isoformat()}"
+            ruta_guardado = filedialog.asksaveasfilename(parent=self.top, defaultextension=extension, initialfile=f"Cierre_Caja_{periodo}{extension}",
+                                                         filetypes=[(f"{descripcion} files", f"*{extension}")])
+            if not ruta_guardado: return
+
+            self.btn_exportar.config(state="disabled")
+            self.ejecutor.enviar(
+                exportar_archivo, self.db_config, fecha_inicio, fecha_fin, ruta_guardado,
+                al_terminar=lambda cantidad: al_exportar(cantidad, ruta_guardado), al_fallar=al_fallar
+            )
+
+        self.ejecutor.enviar(resumen_del_dia, self.db_config, desde, hasta, al_terminar=al_resumir, al_fallar=al_fallar)
@@ -4,6 +4,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import mysql.connector
 from database import Database
+from referencias import obtener_referencias
 
 class DialogoNuevaFamilia(tk.Toplevel):
     def __init__(self, master, db_config, rubros, callback):
@@ -40,19 +41,22 @@ class DialogoNuevaFamilia(tk.Toplevel):
             messagebox.showerror("Error", "Rubro no válido.")
             return
         
+        db = Database(self.db_config)
         try:
-            db = Database(self.db_config)
             db.connect()
             query = "INSERT INTO familia (rubro_id, nombre) VALUES (%s, %s)"
             db.cursor.execute(query, (rubro_id, familia_nombre))
             db.connection.commit()
             db.disconnect()
+            obtener_referencias(self.db_config).invalidar()
             messagebox.showinfo("Éxito", "Familia agregada correctamente.")
             if self.callback:
                 self.callback()
             self.destroy()
         except mysql.connector.Error as err:
             messagebox.showerror("Error", f"No se pudo agregar la nueva familia: {err}")
+        finally:
+            db.disconnect()
 
 class VentanaGestionAtributos(tk.Toplevel):
     def __init__(self, master, db_config, callback_refrescar=None):
@@ -79,26 +83,26 @@ class VentanaGestionAtributos(tk.Toplevel):
     def _abrir_dialogo_nuevo_atributo(self, tabla, columna_valor='nombre'):
         nuevo_valor = simpledialog.askstring("Nuevo Valor", f"Ingrese el nombre del nuevo {tabla.replace('_', ' ').title()}:")
         if nuevo_valor:
+            db = Database(self.db_config)
             try:
-                db = Database(self.db_config)
                 db.connect()
                 query = f"INSERT INTO {tabla} ({columna_valor}) VALUES (%s)"
                 db.cursor.execute(query, (nuevo_valor,))
                 db.connection.commit()
                 db.disconnect()
+                obtener_referencias(self.db_config).invalidar()
                 messagebox.showinfo("Éxito", f"{tabla.replace('_', ' ').title()} agregado correctamente.")
                 if self.callback_refrescar:
                     self.callback_refrescar()
             except mysql.connector.Error as err:
                 messagebox.showerror("Error", f"No se pudo agregar el nuevo valor: {err}")
+            finally:
+                db.disconnect()
 
     def abrir_dialogo_nueva_familia(self):
         try:
-            db = Database(self.db_config)
-            db.connect()
-            db.cursor.execute("SELECT id, nombre FROM rubro")
-            rubros = [(row['id'], row['nombre']) for row in db.cursor.fetchall()]
-            db.disconnect()
-            DialogoNuevaFamilia(self, self.db_config, rubros, self.callback_refrescar)
+            rubros = obtener_referencias(self.db_config).rubro.opciones
         except Exception as e:
             messagebox.showerror("Error de BD", f"No se pudieron cargar los rubros: {e}")
+            return
+        DialogoNuevaFamilia(self, self.db_config, rubros, self.callback_refrescar)
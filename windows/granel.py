@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import messagebox
+from dinero import leer_dinero
 
 class VentanaVentaGranel:
     """
@@ -22,7 +23,7 @@ class VentanaVentaGranel:
 
         self.producto = producto
         self.callback = callback
-        self.var_precio = tk.DoubleVar(value=0.0)
+        self.var_precio = tk.StringVar(value="0.00")
 
         # Muestra el nombre del producto para referencia.
         tk.Label(self.top, text=producto['nombre'], font=("Segoe UI", 11, "bold")).pack(pady=10)
@@ -40,7 +41,7 @@ class VentanaVentaGranel:
     def confirmar(self):
         """Valida el precio y llama al callback para agregar el producto al carrito."""
         try:
-            precio = self.var_precio.get()
+            precio = leer_dinero(self.var_precio.get())
             if precio <= 0:
                 messagebox.showwarning("Atención", "El precio debe ser mayor que 0.")
                 return
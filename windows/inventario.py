@@ -2,9 +2,13 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import mysql.connector
 import requests
-from database import Database
+from database import Database, refrescar_productos_busqueda
+from catalogo import obtener_catalogo
+from indice_busqueda import obtener_indice
+from dinero import leer_dinero
+from referencias import obtener_referencias
+from tareas import obtener_ejecutor
 from models import ProductoSKU
 from windows.searchable_combobox import SearchableCombobox
 
@@ -13,6 +17,8 @@ class VentanaInventario:
     Ventana para la gestión de productos (crear y editar).
     Permite escanear un código de barras para buscar un producto o registrar uno nuevo.
     """
+    SKU_AL_GUARDAR = "Se generará al guardar (valores nuevos)"
+
     def __init__(self, master, db_config, codigo_inicial=None):
         """
         Inicializa la ventana de gestión de inventario (crear y editar productos).
@@ -39,7 +45,7 @@ class VentanaInventario:
         # Variables de Tkinter para vincular a los campos de entrada.
         self.var_codigo = tk.StringVar()
         self.var_nombre = tk.StringVar(value=self.placeholder_text)
-        self.var_precio = tk.DoubleVar(value=0.0)
+        self.var_precio = tk.StringVar(value="0.00")
         self.var_stock = tk.IntVar(value=0)
         self.var_tipo = tk.StringVar(value="Unidad")
         self.var_sku_generado = tk.StringVar(value="Se generará automáticamente")
@@ -48,6 +54,7 @@ class VentanaInventario:
         self.var_rubro = tk.StringVar()
         self.var_familia = tk.StringVar()
         self.producto_existente = False # Flag para saber si se está editando o creando.
+        self.tarea_busqueda = None # Búsqueda en curso, para descartarla si se escanea otro código.
         
         # --- Frame para Escanear Código ---
         frame_scan = tk.Frame(self.top, bg=self.COLOR_FONDO, pady=10) # Reducir pady
@@ -212,94 +219,112 @@ class VentanaInventario:
         """
         Busca un producto en la BD local por su código. Si existe, carga sus datos para edición.
         Si no existe, consulta la API externa y prepara el formulario para un nuevo registro.
+        Las consultas corren en segundo plano; si se escanea otro código antes de que terminen,
+        el resultado anterior se descarta.
         """
         codigo = self.var_codigo.get()
         if not codigo: return
 
+        if self.tarea_busqueda:
+            self.tarea_busqueda.cancelar()
         self.top.config(cursor="watch")
-        self.top.update()
 
+        def al_fallar(err):
+            if not self.top.winfo_exists(): return
+            self.top.config(cursor="")
+            messagebox.showerror("Error", str(err))
+
+        self.tarea_busqueda = obtener_ejecutor(self.top).enviar(
+            self.consultar_producto, codigo,
+            al_terminar=self.configurar_formulario, al_fallar=al_fallar
+        )
+
+    def consultar_producto(self, codigo):
+        """
+        Obtiene el producto local, los detalles de su SKU y, si no existe, el nombre sugerido por la API.
+        Se ejecuta fuera del hilo de la interfaz. Devuelve `(producto_local, sku_details, nombre_api)`.
+        """
+        sku_details = None
+        db = Database(self.db_config)
         try:
-            conexion = mysql.connector.connect(**self.db_config)
-            cursor = conexion.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM productos WHERE codigo_barras = %s", (codigo,))
-            producto_local = cursor.fetchone()
+            db.connect()
+            producto_local = db.fetchone("SELECT * FROM productos WHERE codigo_barras = %s", (codigo,))
+
+            # Cargar los valores de Rubro, Familia, Marca, Atributos si el SKU existe
+            if producto_local and producto_local.get('sku'):
+                try:
+                    query = """
+                        SELECT 
+                            r.nombre as rubro_nombre, 
+                            f.nombre as familia_nombre, 
+                            m.nombre as marca_nombre, 
+                            va1.valor as atributo1_valor, 
+                            va2.valor as atributo2_valor
+                        FROM producto_sku ps
+                        JOIN familia f ON ps.familia_id = f.id
+                        JOIN rubro r ON f.rubro_id = r.id
+                        JOIN marca m ON ps.marca_id = m.id
+                        JOIN valores_atributos va1 ON ps.atributo_1_id = va1.id
+                        JOIN valores_atributos va2 ON ps.atributo_2_id = va2.id
+                        WHERE ps.sku = %s
+                    """
+                    sku_details = db.fetchone(query, (producto_local['sku'],))
+                except Exception as e:
+                    print(f"Error al cargar detalles del SKU: {e}")
+        finally:
+            db.disconnect() # No retener la conexión durante la consulta a la API externa
+
+        nombre_api = None if producto_local else self.consultar_api(codigo)
+        return producto_local, sku_details, nombre_api
+
+    def configurar_formulario(self, resultado):
+        """Vuelca en el formulario el resultado de `consultar_producto`."""
+        producto_local, sku_details, nombre_api = resultado
+        if not self.top.winfo_exists(): return
+        self.top.config(cursor="")
+        self.tarea_busqueda = None
+
+        self.entry_nombre.grid(row=0, column=1, columnspan=3, sticky="ew", padx=10, ipady=4)
+
+        if producto_local:
+            self.producto_existente = True
+            self.btn_guardar.config(text="💾 ACTUALIZAR DATOS", bg="#007bff")
+            self.var_nombre.set(producto_local['nombre'])
+            self.var_precio.set(str(producto_local['precio_venta'])) # DECIMAL de MySQL, sin pasar por float
+            self.var_stock.set(producto_local['stock_actual'])
+            self.var_tipo.set(producto_local.get('tipo', 'Unidad'))
+            self.var_sku_generado.set(producto_local.get('sku', "No disponible")) # Cargar SKU existente
+
+            # Seleccionar los valores de Rubro, Familia, Marca, Atributos si el SKU existe
+            if sku_details:
+                self.var_rubro.set(sku_details['rubro_nombre'])
+                self.cargar_familias_por_rubro() # Actualiza las familias disponibles para el rubro
+                self.var_familia.set(sku_details['familia_nombre'])
+                self.cargar_atributos_por_familia() # Actualiza los labels de atributos
+                self.combo_marca.set(sku_details['marca_nombre'])
+                self.combo_atributo_1.set(sku_details['atributo1_valor'])
+                self.combo_atributo_2.set(sku_details['atributo2_valor'])
+            
+            self.entry_precio.focus_set()
+            self.entry_precio.select_range(0, tk.END)
+        else:
+            self.producto_existente = False
+            self.btn_guardar.config(text="💾 GUARDAR NUEVO", bg=self.COLOR_VERDE)
             
-            self.entry_nombre.grid(row=0, column=1, columnspan=3, sticky="ew", padx=10, ipady=4)
-
-            if producto_local:
-                self.producto_existente = True
-                self.btn_guardar.config(text="💾 ACTUALIZAR DATOS", bg="#007bff")
-                self.var_nombre.set(producto_local['nombre'])
-                self.var_precio.set(producto_local['precio_venta'])
-                self.var_stock.set(producto_local['stock_actual'])
-                self.var_tipo.set(producto_local.get('tipo', 'Unidad'))
-                self.var_sku_generado.set(producto_local.get('sku', "No disponible")) # Cargar SKU existente
-
-                # Cargar y seleccionar los valores de Rubro, Familia, Marca, Atributos si el SKU existe
-                if producto_local.get('sku'):
-                    try:
-                        db = Database(self.db_config)
-                        db.connect()
-                        query = """
-                            SELECT 
-                                r.nombre as rubro_nombre, 
-                                f.nombre as familia_nombre, 
-                                m.nombre as marca_nombre, 
-                                va1.valor as atributo1_valor, 
-                                va2.valor as atributo2_valor
-                            FROM producto_sku ps
-                            JOIN familia f ON ps.familia_id = f.id
-                            JOIN rubro r ON f.rubro_id = r.id
-                            JOIN marca m ON ps.marca_id = m.id
-                            JOIN valores_atributos va1 ON ps.atributo_1_id = va1.id
-                            JOIN valores_atributos va2 ON ps.atributo_2_id = va2.id
-                            WHERE ps.sku = %s
-                        """
-                        db.cursor.execute(query, (producto_local['sku'],))
-                        sku_details = db.cursor.fetchone()
-                        db.disconnect()
-
-                        if sku_details:
-                            self.var_rubro.set(sku_details['rubro_nombre'])
-                            self.cargar_familias_por_rubro() # Actualiza las familias disponibles para el rubro
-                            self.var_familia.set(sku_details['familia_nombre'])
-                            self.cargar_atributos_por_familia() # Actualiza los labels de atributos
-                            self.combo_marca.set(sku_details['marca_nombre'])
-                            self.combo_atributo_1.set(sku_details['atributo1_valor'])
-                            self.combo_atributo_2.set(sku_details['atributo2_valor'])
-                        
-                    except Exception as e:
-                        print(f"Error al cargar detalles del SKU: {e}")
-                
-                self.entry_precio.focus_set()
-                self.entry_precio.select_range(0, tk.END)
+            if nombre_api:
+                self.var_nombre.set(nombre_api)
+                self.entry_nombre.config(fg="black", bg="#d4edda")
+                self.top.after(500, lambda: self.entry_nombre.config(bg="white"))
             else:
-                self.producto_existente = False
-                self.btn_guardar.config(text="💾 GUARDAR NUEVO", bg=self.COLOR_VERDE)
-                
-                nombre_api = self.consultar_api(codigo) 
-                
-                if nombre_api:
-                    self.var_nombre.set(nombre_api)
-                    self.entry_nombre.config(fg="black", bg="#d4edda")
-                    self.top.after(500, lambda: self.entry_nombre.config(bg="white"))
-                else:
-                    self.animar_no_encontrado()
-
-                self.var_precio.set(0.0)
-                self.var_stock.set(0)
-                self.var_tipo.set("Unidad")
-                self.var_sku_generado.set("Se generará automáticamente") # Reset SKU preview for new product
-                self.entry_nombre.focus_set()
-
-            cursor.close()
-            conexion.close()
-            self.generar_sku_preview() # Asegurarse de que el SKU se muestre o se genere si es un producto nuevo.
-        except mysql.connector.Error as err:
-            messagebox.showerror("Error", str(err))
-        finally:
-            self.top.config(cursor="")
+                self.animar_no_encontrado()
+
+            self.var_precio.set("0.00")
+            self.var_stock.set(0)
+            self.var_tipo.set("Unidad")
+            self.var_sku_generado.set("Se generará automáticamente") # Reset SKU preview for new product
+            self.entry_nombre.focus_set()
+
+        self.generar_sku_preview() # Asegurarse de que el SKU se muestre o se genere si es un producto nuevo.
 
     def solo_numeros(self, char):
         """Validador para Tkinter que solo permite caracteres numéricos."""
@@ -334,55 +359,60 @@ class VentanaInventario:
             return
 
         try:
-            precio_final = float(txt_precio)
+            precio_final = leer_dinero(txt_precio)
             stock_final = int(txt_stock) if txt_stock else 0
         except ValueError:
             self.mostrar_mensaje("Precio o stock inválido", "red"); return
 
+        referencias = obtener_referencias(self.db_config)
+        seleccion = self._selecciones_sku()
+        db = Database(self.db_config)
         try:
-            conexion = mysql.connector.connect(**self.db_config)
-            cursor = conexion.cursor()
+            db.connect()
+            conexion, cursor = db.connection, db.cursor
+
+            # La marca y los atributos que no existan se crean acá, en la misma transacción que el
+            # producto: si algo falla no queda ninguna fila suelta. Con eso se calcula el SKU definitivo.
+            sku_final, valores_nuevos = None, False
+            if seleccion:
+                familia_id, marca_nombre, attr1_nombre, attr2_nombre = seleccion
+                valores_nuevos = None in (referencias.marca.id_de(marca_nombre),
+                                          referencias.valores_atributos.id_de(attr1_nombre),
+                                          referencias.valores_atributos.id_de(attr2_nombre))
+                marca_id = db.get_or_create('marca', {'nombre': marca_nombre}, confirmar=False)
+                ids_atributos = db.get_or_create_many('valores_atributos', [attr1_nombre, attr2_nombre], confirmar=False)
+                attr1_id, attr2_id = ids_atributos[attr1_nombre], ids_atributos[attr2_nombre]
+
+                sku_final = ProductoSKU(self.db_config, familia_id, marca_id, attr1_id, attr2_id,
+                                        rubro_id=referencias.rubro_de_familia(familia_id)).generar_sku()
+                sql_sku = "INSERT IGNORE INTO producto_sku (sku, familia_id, marca_id, atributo_1_id, atributo_2_id) VALUES (%s, %s, %s, %s, %s)"
+                cursor.execute(sql_sku, (sku_final, familia_id, marca_id, attr1_id, attr2_id))
             
             if self.producto_existente:
-                sql = "UPDATE productos SET nombre=%s, precio_venta=%s, stock_actual=%s, tipo=%s, sku=%s WHERE codigo_barras=%s"
-                cursor.execute(sql, (nombre, precio_final, stock_final, tipo, sku_generado, codigo))
+                # Sin selecciones completas se conserva el SKU que ya tenía el producto
+                sql = "UPDATE productos SET nombre=%s, precio_venta=%s, stock_actual=%s, tipo=%s, sku=COALESCE(%s, sku) WHERE codigo_barras=%s"
+                cursor.execute(sql, (nombre, precio_final, stock_final, tipo, sku_final, codigo))
                 texto_exito = "✅ Producto Actualizado"
             else:
                 sql = "INSERT INTO productos (codigo_barras, nombre, precio_venta, stock_actual, tipo, sku) VALUES (%s, %s, %s, %s, %s, %s)"
-                cursor.execute(sql, (codigo, nombre, precio_final, stock_final, tipo, sku_generado))
-                
-                # Usar la misma lógica de get_or_create que en la vista previa para asegurar consistencia
-                db_temp = Database(self.db_config)
-                db_temp.connect()
-                
-                familia_id = next((f[0] for f in self.familias if f[1] == self.var_familia.get()), None)
-                
-                marca_nombre = self.combo_marca.get()
-                marca_id = db_temp.get_or_create('marca', {'nombre': marca_nombre})
-                
-                attr1_nombre = self.combo_atributo_1.get()
-                attr1_id = db_temp.get_or_create('valores_atributos', {'valor': attr1_nombre})
-                
-                attr2_nombre = self.combo_atributo_2.get()
-                attr2_id = db_temp.get_or_create('valores_atributos', {'valor': attr2_nombre})
-                
-                db_temp.disconnect()
-
-                if all([sku_generado, familia_id, marca_id, attr1_id, attr2_id]):
-                    sql_sku = "INSERT IGNORE INTO producto_sku (sku, familia_id, marca_id, atributo_1_id, atributo_2_id) VALUES (%s, %s, %s, %s, %s)"
-                    cursor.execute(sql_sku, (sku_generado, familia_id, marca_id, attr1_id, attr2_id))
-
+                cursor.execute(sql, (codigo, nombre, precio_final, stock_final, tipo, sku_final))
                 texto_exito = "✅ Producto Nuevo Registrado"
-            
+
+            refrescar_productos_busqueda(cursor, "p.codigo_barras = %s", (codigo,))
             conexion.commit()
-            cursor.close()
-            conexion.close()
+            db.disconnect()
+            if valores_nuevos:
+                referencias.invalidar() # Para que la marca o los atributos nuevos aparezcan en las listas
+            obtener_catalogo(self.db_config).invalidar(codigos=[codigo]) # Los escaneos verán los datos nuevos
+            obtener_indice(self.db_config).refrescar([codigo]) # Y las búsquedas por texto también
 
             self.mostrar_mensaje(texto_exito, "#28a745")
             self.limpiar_formulario()
             self.entry_codigo.focus_set()
-        except mysql.connector.Error as err:
+        except Exception as err:
             self.mostrar_mensaje(f"Error BD: {err}", "red")
+        finally:
+            db.disconnect()
 
     def mostrar_mensaje(self, texto, color):
         """Muestra un mensaje temporal en la parte inferior de la ventana."""
@@ -394,7 +424,7 @@ class VentanaInventario:
         self.var_codigo.set("")
         self.var_nombre.set(self.placeholder_text)
         self.entry_nombre.config(fg="grey")
-        self.var_precio.set(0)
+        self.var_precio.set("0.00")
         self.var_stock.set(0)
         self.limpiar_formulario_sku()
         self.entry_nombre.grid_forget()
@@ -410,58 +440,58 @@ class VentanaInventario:
         self.var_sku_generado.set("Se generará automáticamente")
 
 
-    def _get_db_options(self, table_name, value_column_name='nombre'):
-        """Helper para obtener opciones de una tabla simple (id,      ││     nombre/valor), asegurando que el ID 1 esté al principio."""
-        options = []
+    def _get_db_options(self, table_name):
+        """Opciones (id, nombre/valor) de una tabla de referencia, con el ID 1 al principio. Salen de la caché compartida."""
         try:
-            db = Database(self.db_config)
-            db.connect()
-            # Fetch the ID=1 option first, if it exists               ││ 418 -         default_option = db.fetchone(f"SELECT id,                 ││     {value_column_name} FROM {table_name} WHERE id = 1")                ││ 419 -         if default_option:                                        ││ 420 -             options.append((default_option['id'],                 ││     default_option[value_column_name]))                                 ││ 421 -                                                                   ││ 422 -         # Fetch all other options, excluding ID=1, and sort them  ││ 423 -         query = f"SELECT id, {value_column_name} FROM             ││     {table_name} WHERE id != 1 ORDER BY {value_column_name}"            ││ 424 -         db.cursor.execute(query) 
-            default_option = db.fetchone(f"SELECT id, {value_column_name} FROM {table_name} WHERE id = 1")
-            if default_option:
-                options.append((default_option['id'], default_option[value_column_name]))
-
-            # Fetch all other options, excluding ID=1, and sort them
-            query = f"SELECT id, {value_column_name} FROM {table_name} WHERE id != 1 ORDER BY {value_column_name}"
-            db.cursor.execute(query)
-            for row in db.cursor.fetchall():
-                options.append((row['id'], row[value_column_name]))
-            db.disconnect()
+            return getattr(obtener_referencias(self.db_config), table_name).opciones_con_primero(1)
         except Exception as e:
             messagebox.showerror("Error de BD", f"No se pudieron cargar las opciones para {table_name}: {e}")
-        return options
+            return []
 
     def cargar_opciones_combobox(self):
         """Carga las opciones iniciales para los comboboxes de Rubro, Marca y Atributos."""
+        self._poblar_opciones()
+        self.limpiar_formulario_sku()
+        # Si otra ventana agrega rubros, marcas o valores mientras esta sigue abierta, las listas se
+        # actualizan al volver a ella (sin tocar lo que ya está elegido).
+        self.top.bind("<FocusIn>", self._refrescar_opciones, add="+")
+
+    def _refrescar_opciones(self, event=None):
+        try:
+            referencias = obtener_referencias(self.db_config)
+            if referencias.version_vigente() == self.version_referencias:
+                return
+            self._poblar_opciones()
+            rubro_id = referencias.rubro.id_de(self.var_rubro.get())
+            self.familias = referencias.familias_de_rubro(rubro_id) if rubro_id else []
+            self.combo_familia['values'] = [f[1] for f in self.familias]
+        except Exception as e:
+            print(f"No se pudieron actualizar las opciones: {e}")
+
+    def _poblar_opciones(self):
+        """Llena las listas de Rubro, Marca y Atributos desde la caché y recuerda su versión."""
         self.rubros = self._get_db_options("rubro")
         self.combo_rubro['values'] = [r[1] for r in self.rubros]
 
         self.marcas = self._get_db_options("marca")
         self.combo_marca.values = [m[1] for m in self.marcas]
 
-        self.valores_atributos = self._get_db_options("valores_atributos", "valor")
+        self.valores_atributos = self._get_db_options("valores_atributos")
         attr_values = [v[1] for v in self.valores_atributos]
         self.combo_atributo_1.values = attr_values
         self.combo_atributo_2.values = attr_values
-        
-        self.limpiar_formulario_sku()
+        self.version_referencias = obtener_referencias(self.db_config).version
 
     def cargar_familias_por_rubro(self, event=None):
         """Carga las familias según el rubro seleccionado."""
-        rubro_seleccionado_nombre = self.var_rubro.get()
-        rubro_id = next((r[0] for r in self.rubros if r[1] == rubro_seleccionado_nombre), None)
-        
+        referencias = obtener_referencias(self.db_config)
         self.familias = []
-        if rubro_id:
-            try:
-                db = Database(self.db_config)
-                db.connect()
-                db.cursor.execute("SELECT id, nombre FROM familia WHERE rubro_id = %s ORDER BY nombre", (rubro_id,))
-                for row in db.cursor.fetchall():
-                    self.familias.append((row['id'], row['nombre']))
-                db.disconnect()
-            except Exception as e:
-                messagebox.showerror("Error de BD", f"No se pudieron cargar las familias: {e}")
+        try:
+            rubro_id = referencias.rubro.id_de(self.var_rubro.get())
+            if rubro_id:
+                self.familias = referencias.familias_de_rubro(rubro_id)
+        except Exception as e:
+            messagebox.showerror("Error de BD", f"No se pudieron cargar las familias: {e}")
         
         self.combo_familia['values'] = [f[1] for f in self.familias]
         if self.familias:
@@ -479,13 +509,9 @@ class VentanaInventario:
         label1, label2 = "Atributo 1", "Atributo 2"
         if familia_id:
             try:
-                db = Database(self.db_config)
-                db.connect()
-                resultado = db.fetchone("SELECT label_atributo_1, label_atributo_2 FROM definicion_atributos WHERE familia_id = %s", (familia_id,))
-                if resultado:
-                    if resultado['label_atributo_1']: label1 = resultado['label_atributo_1']
-                    if resultado['label_atributo_2']: label2 = resultado['label_atributo_2']
-                db.disconnect()
+                etiqueta1, etiqueta2 = obtener_referencias(self.db_config).etiquetas_de_familia(familia_id)
+                if etiqueta1: label1 = etiqueta1
+                if etiqueta2: label2 = etiqueta2
             except Exception as e:
                 messagebox.showerror("Error de BD", f"No se pudieron cargar las etiquetas de atributos: {e}")
 
@@ -493,31 +519,35 @@ class VentanaInventario:
         self.lbl_atributo_2.config(text=f"{label2}:")
         self.generar_sku_preview()
 
+    def _selecciones_sku(self):
+        """Devuelve `(familia_id, marca, atributo 1, atributo 2)` tal como están elegidos, o None si falta alguno."""
+        familia_id = next((f[0] for f in self.familias if f[1] == self.var_familia.get()), None)
+        seleccion = (familia_id, self.combo_marca.get(), self.combo_atributo_1.get(), self.combo_atributo_2.get())
+        return seleccion if all(seleccion) else None
+
     def generar_sku_preview(self, event=None):
-        """Genera un SKU de prueba y lo muestra en el Label."""
+        """
+        Genera un SKU de prueba y lo muestra en el Label. Se calcula en memoria con la caché de
+        referencias; si la marca o algún atributo es nuevo, el SKU se completa recién al guardar.
+        """
         # Se enlaza a los eventos de selección de los combobox para que se actualice en tiempo real
+        seleccion = self._selecciones_sku()
+        if not seleccion:
+            self.var_sku_generado.set("Faltan selecciones para generar SKU")
+            return
+
+        familia_id, marca_nombre, attr1_nombre, attr2_nombre = seleccion
         try:
-            familia_id = next((f[0] for f in self.familias if f[1] == self.var_familia.get()), None)
-            marca_nombre = self.combo_marca.get()
-            attr1_nombre = self.combo_atributo_1.get()
-            attr2_nombre = self.combo_atributo_2.get()
-            
-            # Validar que los campos editables no estén vacíos
-            if not all([familia_id, marca_nombre, attr1_nombre, attr2_nombre]):
-                self.var_sku_generado.set("Faltan selecciones para generar SKU")
+            referencias = obtener_referencias(self.db_config)
+            marca_id = referencias.marca.id_de(marca_nombre)
+            attr1_id = referencias.valores_atributos.id_de(attr1_nombre)
+            attr2_id = referencias.valores_atributos.id_de(attr2_nombre)
+            if None in (marca_id, attr1_id, attr2_id):
+                self.var_sku_generado.set(self.SKU_AL_GUARDAR)
                 return
 
-            # Obtener IDs de tablas de atributos (o crearlos si no existen)
-            db = Database(self.db_config)
-            db.connect()
-            
-            marca_id = db.get_or_create('marca', {'nombre': marca_nombre})
-            attr1_id = db.get_or_create('valores_atributos', {'valor': attr1_nombre})
-            attr2_id = db.get_or_create('valores_atributos', {'valor': attr2_nombre})
-
-            producto_sku_gen = ProductoSKU(self.db_config, familia_id, marca_id, attr1_id, attr2_id)
+            producto_sku_gen = ProductoSKU(self.db_config, familia_id, marca_id, attr1_id, attr2_id,
+                                           rubro_id=referencias.rubro_de_familia(familia_id))
             self.var_sku_generado.set(producto_sku_gen.generar_sku())
-            db.disconnect()
-
         except Exception as e:
             self.var_sku_generado.set(f"Error SKU: {e}")
@@ -2,13 +2,89 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import mysql.connector
+from database import Database
+from tareas import obtener_ejecutor
+from indice_busqueda import normalizar, obtener_indice
+
+CAMPOS_PRODUCTO = "id, codigo_barras, nombre, precio_venta, stock_actual, sku"
+
+class FuenteProductosBD:
+    """
+    Recorre la tabla de productos por páginas usando paginación por clave sobre (nombre, id).
+    Cada página cuesta lo mismo sin importar en qué parte del catálogo esté, a diferencia de OFFSET.
+    """
+    def __init__(self, db_config):
+        self.db_config = db_config
+
+    def clave_de(self, fila):
+        return (fila['nombre'], fila['id'])
+
+    def pagina(self, direccion, clave, cantidad):
+        """
+        Devuelve hasta `cantidad` filas en orden (nombre, id), posteriores ('despues') o anteriores ('antes')
+        a `clave`. Con `clave=None` devuelve la primera página. Se llama fuera del hilo de la interfaz.
+        """
+        if clave is None:
+            query, params = f"SELECT {CAMPOS_PRODUCTO} FROM productos ORDER BY nombre ASC, id ASC LIMIT %s", (cantidad,)
+        elif direccion == 'despues':
+            # Condición expandida (no `(nombre, id) > (...)`): así el optimizador la resuelve como rango
+            # sobre idx_productos_nombre_id y empieza a leer en la clave, sin recorrer el índice desde el comienzo.
+            query = (f"SELECT {CAMPOS_PRODUCTO} FROM productos WHERE nombre > %s OR (nombre = %s AND id > %s) "
+                     "ORDER BY nombre ASC, id ASC LIMIT %s")
+            params = (clave[0], clave[0], clave[1], cantidad)
+        else:
+            query = (f"SELECT {CAMPOS_PRODUCTO} FROM productos WHERE nombre < %s OR (nombre = %s AND id < %s) "
+                     "ORDER BY nombre DESC, id DESC LIMIT %s")
+            params = (clave[0], clave[0], clave[1], cantidad)
+
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            filas = db.fetchall(query, params)
+        finally:
+            db.disconnect()
+        if direccion == 'antes':
+            filas.reverse()
+        return filas
+
+    def resumen(self):
+        """Cantidad de productos y valor total del inventario, calculados por el servidor."""
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            fila = db.fetchone("SELECT COUNT(*) AS cantidad, COALESCE(SUM(precio_venta * stock_actual), 0) AS valor FROM productos")
+        finally:
+            db.disconnect()
+        return fila['cantidad'], fila['valor']
+
+class FuenteLista:
+    """Misma interfaz que `FuenteProductosBD`, pero sobre una lista ya filtrada en memoria. La clave es la posición."""
+    def __init__(self, filas):
+        self.filas = filas
+        self._posiciones = {fila['id']: i for i, fila in enumerate(filas)}
+
+    def clave_de(self, fila):
+        return self._posiciones[fila['id']]
+
+    def pagina(self, direccion, clave, cantidad):
+        if clave is None:
+            return self.filas[:cantidad]
+        if direccion == 'despues':
+            return self.filas[clave + 1:clave + 1 + cantidad]
+        return self.filas[max(0, clave - cantidad):clave]
 
 class VentanaDetalleInventario:
     """
     Crea una ventana que muestra un listado completo de todos los productos en el inventario,
     con la capacidad de buscar y filtrar. El diseño se alinea con el resto del proyecto.
+
+    La tabla es virtual: solo se traen y se dibujan las filas cercanas a la parte visible. Al acercarse
+    a un extremo se pide la página siguiente (o anterior) y se descartan las filas del extremo opuesto.
     """
+    TAM_PAGINA = 100
+    ESPERA_FILTRO_MS = 250 # Se filtra cuando el usuario deja de teclear este tiempo
+    MAX_FILAS = 400 # Filas que se mantienen dibujadas como máximo
+
     def __init__(self, master, db_config):
         """
         Inicializa la ventana de detalle de inventario.
@@ -19,7 +95,22 @@ class VentanaDetalleInventario:
         self.top.title("Inventario General")
         self.top.geometry("1200x700")
         self.db_config = db_config
-        self.todos_los_productos = []  # Almacenar todos los productos para un filtrado rápido
+        self.todos_los_productos = None  # Se carga recién la primera vez que se filtra
+        self.tarea_carga = None
+        self._indice_busqueda = [] # (texto normalizado, valor en stock, producto), armado una vez por carga
+        self._posiciones = {} # id de producto -> posición en `_indice_busqueda`
+        self._ultima_busqueda = ""
+        self._ultimo_resultado = [] # Entradas de `_indice_busqueda` que coincidieron con `_ultima_busqueda`
+        self._filtro_programado = None
+        self.ejecutor = obtener_ejecutor(self.top)
+
+        # Estado de la ventana virtual de filas
+        self._fuente = None
+        self._claves = {} # iid -> clave de la fila en la fuente
+        self._hay_antes = False
+        self._hay_despues = False
+        self._cargando = False
+        self._generacion = 0 # Se incrementa al cambiar de fuente, para descartar páginas viejas
 
         # --- Estilos Consistentes ---
         self.COLOR_FONDO = "#e6e6e6"
@@ -38,7 +129,7 @@ class VentanaDetalleInventario:
         tk.Label(frame_controls, text="Buscar por Nombre/Código/SKU:", bg=self.COLOR_FONDO, font=("Segoe UI", 10)).pack(side="left", padx=(0, 5))
         self.entry_buscar = tk.Entry(frame_controls, width=40, font=("Segoe UI", 11))
         self.entry_buscar.pack(side="left", fill="x", expand=True, padx=5)
-        self.entry_buscar.bind('<KeyRelease>', self.filtrar_datos)
+        self.entry_buscar.bind('<KeyRelease>', self._programar_filtrado)
 
         tk.Button(frame_controls, text="🔄 Actualizar Lista", font=("Segoe UI", 10, "bold"), bg="#28a745", fg="white", command=self.cargar_datos).pack(side="right", padx=10, ipadx=10)
 
@@ -70,11 +161,11 @@ class VentanaDetalleInventario:
         self.tree.column("Valor Total", width=120, anchor="e")
         self.tree.column("SKU", width=150, anchor="center")
 
-        scrollbar = ttk.Scrollbar(frame_tree, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(frame_tree, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscroll=self._al_desplazar)
         
         self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
 
         self.tree.tag_configure('low_stock', background='#fff0f0', foreground='#a00000')
         self.tree.tag_configure('normal_stock', background='white')
@@ -89,68 +180,211 @@ class VentanaDetalleInventario:
 
     def cargar_datos(self):
         """
-        Limpia la tabla y vuelve a cargar todos los productos desde la base de datos a una lista local,
-        luego llama a `actualizar_treeview` para poblar la tabla.
+        Vuelve a mostrar el listado completo desde la base de datos, página por página,
+        y descarta la copia local usada para filtrar para que se recargue con los datos nuevos.
         """
-        try:
-            conexion = mysql.connector.connect(**self.db_config)
-            cursor = conexion.cursor(dictionary=True)
-            cursor.execute("SELECT id, codigo_barras, nombre, precio_venta, stock_actual, sku FROM productos ORDER BY nombre ASC")
-            self.todos_los_productos = cursor.fetchall()
-            cursor.close()
-            conexion.close()
-            
-            self.entry_buscar.delete(0, tk.END)
-            self.actualizar_treeview(self.todos_los_productos)
-
-        except mysql.connector.Error as err:
-            messagebox.showerror("Error de Carga", f"No se pudieron cargar los productos: {err}", parent=self.top)
+        if self.tarea_carga:
+            self.tarea_carga.cancelar()
+            self.tarea_carga = None
+        self.todos_los_productos = None
+        self._indice_busqueda, self._posiciones, self._ultima_busqueda, self._ultimo_resultado = [], {}, "", []
+        self.entry_buscar.delete(0, tk.END)
+        self.mostrar_listado_completo()
+
+    def mostrar_listado_completo(self):
+        """Muestra todos los productos con paginación del lado del servidor."""
+        fuente = FuenteProductosBD(self.db_config)
+        self.lbl_info.config(text="Cargando...")
+        self.mostrar_fuente(fuente)
+        generacion = self._generacion
+        self.ejecutor.enviar(
+            fuente.resumen,
+            al_terminar=lambda resumen: self._mostrar_resumen(generacion, *resumen),
+            al_fallar=self._error_carga, canal="listado-inventario"
+        )
+
+    def _programar_filtrado(self, event=None):
+        """Reinicia la espera en cada tecla, así una palabra escrita de corrido se filtra una sola vez."""
+        if self._filtro_programado:
+            self.top.after_cancel(self._filtro_programado)
+        self._filtro_programado = self.top.after(self.ESPERA_FILTRO_MS, self.filtrar_datos)
 
     def filtrar_datos(self, event=None):
         """
-        Filtra la lista local de productos `self.todos_los_productos` y actualiza el Treeview.
+        Filtra la lista local de productos `self.todos_los_productos` y muestra el resultado.
+        La lista se trae en segundo plano la primera vez que se escribe una búsqueda.
+        Si la búsqueda nueva extiende a la anterior, solo se revisan los resultados anteriores.
         """
-        busqueda = self.entry_buscar.get().lower()
+        self._filtro_programado = None
+        busqueda = normalizar(self.entry_buscar.get())
         if not busqueda:
-            productos_filtrados = self.todos_los_productos
+            if self._ultima_busqueda or self._fuente is None:
+                self._ultima_busqueda, self._ultimo_resultado = "", []
+                self.mostrar_listado_completo()
+            return
+
+        if self.todos_los_productos is None:
+            if self.tarea_carga is None:
+                self.lbl_info.config(text="Preparando búsqueda...")
+                self.tarea_carga = self.ejecutor.enviar(
+                    self._consultar_todos, al_terminar=self._productos_cargados, al_fallar=self._error_carga
+                )
+            return
+
+        if busqueda == self._ultima_busqueda:
+            return # Teclas que no cambian el texto (flechas, Shift, etc.)
+
+        if self._ultima_busqueda and busqueda.startswith(self._ultima_busqueda):
+            candidatos = self._ultimo_resultado # Todo lo que contiene la búsqueda nueva ya contenía la anterior
+        elif len(busqueda) >= 3:
+            # El índice de trigramas compartido da los productos que contienen el texto sin recorrer el catálogo
+            ids = obtener_indice(self.db_config).subcadena(busqueda)
+            posiciones = sorted(self._posiciones[i] for i in ids if i in self._posiciones)
+            candidatos = [self._indice_busqueda[i] for i in posiciones]
         else:
-            productos_filtrados = []
-            for p in self.todos_los_productos:
-                nombre_val = p.get('nombre', '').lower()
-                codigo_val = p.get('codigo_barras', '')
-                sku_val = p.get('sku', '') or "" # Manejar SKU que pueda ser None
-                
-                if busqueda in nombre_val or busqueda in codigo_val or busqueda in sku_val.lower():
-                    productos_filtrados.append(p)
-        
-        self.actualizar_treeview(productos_filtrados)
+            candidatos = self._indice_busqueda
+        resultado = [entrada for entrada in candidatos if busqueda in entrada[0]]
+        self._ultima_busqueda, self._ultimo_resultado = busqueda, resultado
+
+        self.mostrar_fuente(FuenteLista([entrada[2] for entrada in resultado]))
+        valor = sum(entrada[1] for entrada in resultado)
+        self._mostrar_resumen(self._generacion, len(resultado), valor)
 
-    def actualizar_treeview(self, productos):
+    def _consultar_todos(self):
         """
-        Limpia el Treeview y lo llena con la lista de productos proporcionada.
-        Calcula estadísticas y aplica estilos.
+        Trae el catálogo completo para filtrar en memoria. Se llama fuera del hilo de la interfaz.
+        Con las mismas filas se pone al día el índice de trigramas compartido, así los productos
+        agregados o renombrados desde otra terminal aparecen al filtrar.
         """
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        total_inventario_dinero = 0
-        total_items = len(productos)
-
-        for p in productos:
-            valor_stock = p.get('precio_venta', 0) * p.get('stock_actual', 0)
-            total_inventario_dinero += valor_stock
-            tag = 'low_stock' if p.get('stock_actual', 0) <= 5 else 'normal_stock'
-
-            self.tree.insert("", "end", values=(
-                p.get('id', ''),
-                p.get('codigo_barras', ''),
-                p.get('nombre', ''),
-                f"${p.get('precio_venta', 0):.2f}",
-                p.get('stock_actual', 0),
-                f"${valor_stock:,.2f}",
-                p.get('sku', '')
-            ), tags=(tag,))
+        db = Database(self.db_config)
+        try:
+            db.connect()
+            productos = db.fetchall(f"SELECT {CAMPOS_PRODUCTO} FROM productos ORDER BY nombre ASC, id ASC")
+        finally:
+            db.disconnect()
+        obtener_indice(self.db_config).sincronizar(productos)
+        return productos
+
+    def _productos_cargados(self, productos):
+        if not self.top.winfo_exists(): return
+        self.tarea_carga = None
+        self.todos_los_productos = productos
+        # Nombre, código y SKU normalizados en un solo texto (como en el índice de trigramas);
+        # el separador evita coincidencias entre campos.
+        self._indice_busqueda = [
+            (f"{normalizar(p['nombre'])}\x00{normalizar(p['codigo_barras'])}\x00{normalizar(p['sku'])}",
+             p['precio_venta'] * p['stock_actual'], p)
+            for p in productos
+        ]
+        self._posiciones = {entrada[2]['id']: i for i, entrada in enumerate(self._indice_busqueda)}
+        self._ultima_busqueda, self._ultimo_resultado = "", []
+        self.filtrar_datos()
+
+    def _error_carga(self, err):
+        if not self.top.winfo_exists(): return
+        self.tarea_carga = None
+        self._cargando = False
+        messagebox.showerror("Error de Carga", f"No se pudieron cargar los productos: {err}", parent=self.top)
 
+    def _mostrar_resumen(self, generacion, total_items, total_inventario_dinero):
+        if not self.top.winfo_exists() or generacion != self._generacion: return
         # Formateo con separadores de miles
         total_inventario_str = f"${total_inventario_dinero:,.2f}"
         self.lbl_info.config(text=f"Mostrando: {total_items} productos  |  Valor Total del Inventario Filtrado: {total_inventario_str}")
+
+    # --- Tabla virtual ---
+
+    def mostrar_fuente(self, fuente):
+        """Vacía la tabla y empieza a mostrar las filas de `fuente` desde el principio."""
+        self._generacion += 1
+        self._fuente = fuente
+        self._claves = {}
+        self._hay_antes, self._hay_despues = False, True
+        self._cargando = False
+        self.tree.delete(*self.tree.get_children())
+        self._pedir_pagina('despues')
+
+    def _al_desplazar(self, primero, ultimo):
+        """`yscrollcommand` de la tabla: mueve la barra y pide más filas al acercarse a un extremo."""
+        self.scrollbar.set(primero, ultimo)
+        if float(ultimo) > 0.9 and self._hay_despues:
+            self._pedir_pagina('despues')
+        elif float(primero) < 0.1 and self._hay_antes:
+            self._pedir_pagina('antes')
+
+    def _pedir_pagina(self, direccion):
+        if self._cargando or self._fuente is None:
+            return
+        hijos = self.tree.get_children()
+        clave = None
+        if hijos:
+            clave = self._claves[hijos[-1] if direccion == 'despues' else hijos[0]]
+        self._cargando = True
+        generacion = self._generacion
+        self.ejecutor.enviar(
+            self._fuente.pagina, direccion, clave, self.TAM_PAGINA,
+            al_terminar=lambda filas: self._recibir_pagina(generacion, direccion, filas),
+            al_fallar=self._error_carga, canal="listado-inventario"
+        )
+
+    def _recibir_pagina(self, generacion, direccion, filas):
+        if not self.top.winfo_exists() or generacion != self._generacion: return
+        self._cargando = False
+        fuente = self._fuente
+
+        # La vista de un Treeview se expresa como índice de la primera fila visible; al agregar o quitar
+        # filas por arriba hay que correrla para que el usuario siga viendo lo mismo.
+        cantidad_antes = len(self.tree.get_children())
+        primera_visible = round(self.tree.yview()[0] * cantidad_antes)
+        desplazamiento = 0
+
+        if direccion == 'despues':
+            self._hay_despues = len(filas) == self.TAM_PAGINA
+            for p in filas:
+                iid = self._insertar(p, "end")
+                if iid:
+                    self._claves[iid] = fuente.clave_de(p)
+        else:
+            self._hay_antes = len(filas) == self.TAM_PAGINA
+            for p in filas:
+                iid = self._insertar(p, desplazamiento)
+                if iid:
+                    self._claves[iid] = fuente.clave_de(p)
+                    desplazamiento += 1
+
+        hijos = self.tree.get_children()
+        sobrantes = len(hijos) - self.MAX_FILAS
+        if sobrantes > 0:
+            if direccion == 'despues':
+                descartadas = hijos[:sobrantes]
+                self._hay_antes = True
+                desplazamiento -= sobrantes
+            else:
+                descartadas = hijos[-sobrantes:]
+                self._hay_despues = True
+            self.tree.delete(*descartadas)
+            for iid in descartadas:
+                del self._claves[iid]
+
+        if desplazamiento and cantidad_antes:
+            total = len(self.tree.get_children())
+            self.tree.yview_moveto(max(0, primera_visible + desplazamiento) / total)
+
+    def _insertar(self, p, posicion):
+        """
+        Dibuja una fila de producto en `posicion` y devuelve su iid, o None si el producto ya está en la
+        tabla (pasa si otra terminal lo renombró y reaparece en la página siguiente).
+        """
+        if self.tree.exists(str(p['id'])):
+            return None
+        valor_stock = p.get('precio_venta', 0) * p.get('stock_actual', 0)
+        tag = 'low_stock' if p.get('stock_actual', 0) <= 5 else 'normal_stock'
+        return self.tree.insert("", posicion, iid=str(p['id']), values=(
+            p.get('id', ''),
+            p.get('codigo_barras', ''),
+            p.get('nombre', ''),
+            f"${p.get('precio_venta', 0):.2f}",
+            p.get('stock_actual', 0),
+            f"${valor_stock:,.2f}",
+            p.get('sku', '')
+        ), tags=(tag,))